@@ -3,48 +3,324 @@ Agent Storage System.
 Manages persistence and retrieval of AI agents using JSON storage.
 """
 
+import atexit
 import json
 import logging
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data: Any, pretty: bool = False) -> bytes:
+    """Serialize data to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 class AgentStorage:
     """
     Handles storage and retrieval of AI agents in a JSON file.
+    
+    Agents are kept in memory keyed by name; reads never touch the disk and
+    mutations are written back on a short debounce (and at interpreter exit).
+    
+    The in-memory state is copy-on-write: writers build new dicts under a lock
+    and publish them as one snapshot, so readers never need to lock.
     """
     
-    def __init__(self, storage_file: str = "agents_storage.json"):
+    def __init__(self, storage_file: str = "agents_storage.json", flush_delay: float = 0.1):
         """
         Initialize agent storage.
         
         Args:
-            storage_file: Path to the JSON storage file
+            storage_file: Path to the JSON storage file; a ".zst" suffix
+                stores it zstd-compressed (requires the zstandard package)
+            flush_delay: Seconds to wait after a mutation before writing to disk
         """
         self.storage_file = storage_file
+        self._compressed = storage_file.endswith(".zst")
+        if self._compressed and zstd is None:
+            raise ImportError("zstandard is required for compressed storage files (.zst)")
+        self.flush_delay = flush_delay
+        # (name -> agent, task type -> name -> agent); never mutated once published
+        self._snapshot: Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Dict[str, Any]]]] = ({}, {})
+        # Writer-side bookkeeping: name -> task type key
+        self._agent_type: Dict[str, str] = {}
+        self._stats_cache: Optional[Tuple[Any, Dict[str, Any]]] = None
+        self._list_cache: Optional[Tuple[Any, List[Dict[str, Any]]]] = None
+        # Names saved (True) or deleted (False) since the last flush
+        self._pending: Dict[str, bool] = {}
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        
         self._ensure_storage_file()
-        logging.info(f"Agent storage initialized with file: {storage_file}")
+        # The file is created (or repaired) above; flushes keep this up to date
+        self._file_exists = True
+        # Unregistered by close(); until then this keeps the instance alive
+        atexit.register(self.flush)
+        logger.info("Agent storage initialized with file: %s", storage_file)
     
     def _ensure_storage_file(self):
-        """Ensure the storage file exists and is properly formatted."""
-        if not os.path.exists(self.storage_file):
-            # Create empty storage file
-            with open(self.storage_file, 'w') as f:
-                json.dump({"agents": []}, f, indent=2)
-            logging.info(f"Created new storage file: {self.storage_file}")
-        else:
-            # Validate existing file
+        """
+        Load the storage file in a single pass, creating or repairing it if needed.
+        
+        The loaded agents populate the in-memory indexes, so nothing has to
+        re-read the file afterwards.
+        """
+        with self._locked():
+            data = {"agents": []}
             try:
-                with open(self.storage_file, 'r') as f:
-                    data = json.load(f)
+                # Exclusive create: one syscall when the file already exists
+                with open(self.storage_file, 'xb') as f:
+                    f.write(self._encode(data))
+                logger.info("Created new storage file: %s", self.storage_file)
+            except FileExistsError:
+                try:
+                    data = self._read_file()
+                except (ValueError, IOError) as e:
+                    logger.warning("Storage file corrupted, creating new one: %s", e)
+                    data = {"agents": []}
+                    self._atomic_write(data)
+                else:
                     if "agents" not in data:
                         data["agents"] = []
-                        with open(self.storage_file, 'w') as f:
-                            json.dump(data, f, indent=2)
-            except (json.JSONDecodeError, IOError) as e:
-                logging.warning(f"Storage file corrupted, creating new one: {e}")
-                with open(self.storage_file, 'w') as f:
-                    json.dump({"agents": []}, f, indent=2)
+                        self._atomic_write(data)
+        
+        self._set_agents(data["agents"])
+    
+    def _set_agents(self, agents: Iterable[Dict[str, Any]]):
+        """Replace the in-memory agents and rebuild the indexes."""
+        by_name = {agent.get("name"): agent for agent in agents}
+        by_type = {}
+        owned = set()
+        self._agent_type.clear()
+        for agent in by_name.values():
+            self._index_agent(by_type, owned, agent)
+        self._snapshot = (by_name, by_type)
+    
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive cross-process lock on the storage file."""
+        with open(self.storage_file + ".lock", 'wb') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    
+    def _merge_from_disk(self):
+        """
+        Apply pending changes on top of the agents currently on disk.
+        
+        Another process may have written the file since it was loaded, so
+        only the names changed here override what is stored. Caller must
+        hold both locks.
+        """
+        try:
+            disk_agents = self._read_file().get("agents", [])
+        except FileNotFoundError:
+            # Removed since it was loaded; the flush writes it again
+            self._file_exists = False
+            return
+        except (ValueError, IOError) as e:
+            logger.warning("Could not re-read storage file before flush: %s", e)
+            return
+        
+        current = self._snapshot[0]
+        merged = {}
+        for agent in disk_agents:
+            name = agent.get("name")
+            saved = self._pending.get(name)
+            if saved is None:
+                merged[name] = agent
+            elif saved:
+                merged[name] = current[name]
+        
+        for name, saved in self._pending.items():
+            if saved and name not in merged:
+                merged[name] = current[name]
+        
+        self._set_agents(merged.values())
+    
+    @staticmethod
+    def _type_key(agent: Dict[str, Any]) -> str:
+        """Get the normalized task type used to index an agent."""
+        return str(agent.get("task_type") or "").lower()
+    
+    @staticmethod
+    def _owned_bucket(by_type: Dict[str, Dict[str, Any]], owned: Set[str], type_key: str) -> Dict[str, Any]:
+        """Get a task type bucket private to the current write, copying it on first touch."""
+        if type_key not in owned:
+            by_type[type_key] = dict(by_type.get(type_key, ()))
+            owned.add(type_key)
+        return by_type[type_key]
+    
+    def _index_agent(self, by_type: Dict[str, Dict[str, Any]], owned: Set[str], agent: Dict[str, Any]):
+        """Add (or move) an agent in a task type index being written."""
+        name = agent.get("name")
+        type_key = self._type_key(agent)
+        
+        previous_key = self._agent_type.get(name)
+        if previous_key is not None and previous_key != type_key:
+            self._unindex_agent(by_type, owned, name)
+        
+        self._owned_bucket(by_type, owned, type_key)[name] = agent
+        self._agent_type[name] = type_key
+    
+    def _unindex_agent(self, by_type: Dict[str, Dict[str, Any]], owned: Set[str], agent_name: str):
+        """Remove an agent from a task type index being written."""
+        type_key = self._agent_type.pop(agent_name, None)
+        if type_key is None:
+            return
+        
+        bucket = self._owned_bucket(by_type, owned, type_key)
+        bucket.pop(agent_name, None)
+        if not bucket:
+            del by_type[type_key]
+            owned.discard(type_key)
+    
+    def _read_file(self) -> Any:
+        """
+        Read and parse the storage file.
+        
+        Raises:
+            ValueError: If the file cannot be decompressed or parsed
+        """
+        with open(self.storage_file, 'rb') as f:
+            raw = f.read()
+        
+        if self._compressed:
+            try:
+                raw = zstd.ZstdDecompressor().decompress(raw)
+            except zstd.ZstdError as e:
+                raise ValueError(f"Invalid zstd data: {e}") from e
+        
+        return _loads(raw)
+    
+    def _encode(self, data: Dict[str, Any]) -> bytes:
+        """Serialize data in the on-disk format (compressed for .zst files)."""
+        payload = _dumps(data)
+        if self._compressed:
+            payload = zstd.ZstdCompressor(level=3).compress(payload)
+        return payload
+    
+    def _atomic_write(self, data: Dict[str, Any]):
+        """
+        Atomically replace the storage file with data.
+        
+        The data is written and fsynced to a temporary file which is then moved
+        over the storage file, so a crash never leaves a truncated file behind.
+        """
+        tmp_file = self.storage_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(self._encode(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.storage_file)
+    
+    def _schedule_flush(self):
+        """Arm (or re-arm) the debounced flush. Caller must hold the lock."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def flush(self) -> bool:
+        """
+        Write pending changes to the storage file.
+        
+        Returns:
+            True if storage is up to date on disk, False otherwise
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            
+            if not self._pending:
+                return True
+            
+            try:
+                with self._locked():
+                    self._merge_from_disk()
+                    self._atomic_write({"agents": list(self._snapshot[0].values())})
+                self._pending.clear()
+                self._file_exists = True
+                return True
+            except (TypeError, ValueError, IOError) as e:
+                logger.error("Error flushing agents to %s: %s", self.storage_file, e)
+                self._file_exists = os.path.exists(self.storage_file)
+                return False
+    
+    def close(self) -> bool:
+        """
+        Flush pending changes and stop flushing this storage at exit.
+        
+        Call this when discarding a storage instance before the process ends,
+        so the exit hook no longer keeps it alive.
+        
+        Returns:
+            True if storage is up to date on disk, False otherwise
+        """
+        flushed = self.flush()
+        atexit.unregister(self.flush)
+        return flushed
+    
+    def export_json(self, export_file: str, pretty: bool = False) -> bool:
+        """
+        Export all agents to a JSON file.
+        
+        Args:
+            export_file: Path of the file to write
+            pretty: Indent the output for human consumption
+            
+        Returns:
+            True if exported successfully, False otherwise
+        """
+        try:
+            with open(export_file, 'wb') as f:
+                f.write(_dumps({"agents": self.list_agents()}, pretty=pretty))
+            return True
+            
+        except (TypeError, ValueError, IOError) as e:
+            logger.error("Error exporting agents to %s: %s", export_file, e)
+            return False
     
     def save_agent(self, agent: Dict[str, Any]) -> bool:
         """
@@ -56,36 +332,51 @@ class AgentStorage:
         Returns:
             True if saved successfully, False otherwise
         """
-        try:
-            # Load existing agents
-            with open(self.storage_file, 'r') as f:
-                data = json.load(f)
-            
-            # Check if agent already exists (by name)
-            existing_agent_index = None
-            for i, existing_agent in enumerate(data["agents"]):
-                if existing_agent.get("name") == agent.get("name"):
-                    existing_agent_index = i
-                    break
-            
-            if existing_agent_index is not None:
-                # Update existing agent
-                data["agents"][existing_agent_index] = agent
-                logging.info(f"Updated existing agent: {agent.get('name')}")
-            else:
-                # Add new agent
-                data["agents"].append(agent)
-                logging.info(f"Added new agent: {agent.get('name')}")
-            
-            # Save back to file
-            with open(self.storage_file, 'w') as f:
-                json.dump(data, f, indent=2)
+        return self.save_many([agent]) == 1
+    
+    def save_many(self, agents: List[Dict[str, Any]]) -> int:
+        """
+        Save several agents at once, scheduling a single write for the batch.
+        
+        Args:
+            agents: Agent dictionaries to insert or update (matched by name)
             
-            return True
+        Returns:
+            Number of agents inserted or updated
+        """
+        saved = []
+        agent = None
+        
+        try:
+            with self._lock:
+                by_name, by_type = self._snapshot
+                by_name, by_type, owned = dict(by_name), dict(by_type), set()
+                try:
+                    for agent in agents:
+                        name = agent.get("name")
+                        exists = name in by_name
+                        # Index first so an agent that fails is neither stored nor counted
+                        self._index_agent(by_type, owned, agent)
+                        by_name[name] = agent
+                        saved.append((name, exists))
+                        self._pending[name] = True
+                finally:
+                    if saved:
+                        self._snapshot = (by_name, by_type)
+                        self._schedule_flush()
             
         except Exception as e:
-            logging.error(f"Error saving agent {agent.get('name', 'Unknown')}: {e}")
-            return False
+            name = agent.get('name', 'Unknown') if isinstance(agent, dict) else 'Unknown'
+            logger.error("Error saving agent %s: %s", name, e)
+        
+        if logger.isEnabledFor(logging.INFO):
+            for name, exists in saved:
+                if exists:
+                    logger.info("Updated existing agent: %s", name)
+                else:
+                    logger.info("Added new agent: %s", name)
+        
+        return len(saved)
     
     def get_agent(self, agent_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -97,36 +388,23 @@ class AgentStorage:
         Returns:
             Agent dictionary if found, None otherwise
         """
-        try:
-            with open(self.storage_file, 'r') as f:
-                data = json.load(f)
-            
-            for agent in data["agents"]:
-                if agent.get("name") == agent_name:
-                    return agent
-            
-            return None
-            
-        except Exception as e:
-            logging.error(f"Error retrieving agent {agent_name}: {e}")
-            return None
+        return self._snapshot[0].get(agent_name)
     
     def list_agents(self) -> List[Dict[str, Any]]:
         """
         Get all stored agents.
         
+        The same list object is returned until the next mutation, so callers
+        can cheaply tell whether anything changed; treat it as read-only.
+        
         Returns:
             List of all agent dictionaries
         """
-        try:
-            with open(self.storage_file, 'r') as f:
-                data = json.load(f)
-            
-            return data.get("agents", [])
-            
-        except Exception as e:
-            logging.error(f"Error listing agents: {e}")
-            return []
+        snapshot = self._snapshot
+        cached = self._list_cache
+        if cached is None or cached[0] is not snapshot:
+            cached = self._list_cache = (snapshot, list(snapshot[0].values()))
+        return cached[1]
     
     def delete_agent(self, agent_name: str) -> bool:
         """
@@ -138,30 +416,23 @@ class AgentStorage:
         Returns:
             True if deleted successfully, False otherwise
         """
-        try:
-            with open(self.storage_file, 'r') as f:
-                data = json.load(f)
-            
-            # Find and remove agent
-            original_count = len(data["agents"])
-            data["agents"] = [agent for agent in data["agents"] 
-                            if agent.get("name") != agent_name]
-            
-            if len(data["agents"]) < original_count:
-                # Agent was found and removed
-                with open(self.storage_file, 'w') as f:
-                    json.dump(data, f, indent=2)
-                
-                logging.info(f"Deleted agent: {agent_name}")
-                return True
-            else:
-                # Agent not found
-                logging.warning(f"Agent not found for deletion: {agent_name}")
-                return False
-            
-        except Exception as e:
-            logging.error(f"Error deleting agent {agent_name}: {e}")
-            return False
+        with self._lock:
+            by_name, by_type = self._snapshot
+            removed = agent_name in by_name
+            if removed:
+                by_name, by_type = dict(by_name), dict(by_type)
+                del by_name[agent_name]
+                self._unindex_agent(by_type, set(), agent_name)
+                self._snapshot = (by_name, by_type)
+                self._pending[agent_name] = False
+                self._schedule_flush()
+        
+        if removed:
+            logger.info("Deleted agent: %s", agent_name)
+        else:
+            logger.warning("Agent not found for deletion: %s", agent_name)
+        
+        return removed
     
     def get_agents_by_type(self, task_type: str) -> List[Dict[str, Any]]:
         """
@@ -173,44 +444,43 @@ class AgentStorage:
         Returns:
             List of agents that match the task type
         """
-        try:
-            all_agents = self.list_agents()
-            matching_agents = [
-                agent for agent in all_agents 
-                if agent.get("task_type", "").lower() == task_type.lower()
-            ]
-            
-            return matching_agents
-            
-        except Exception as e:
-            logging.error(f"Error getting agents by type {task_type}: {e}")
-            return []
+        bucket = self._snapshot[1].get(task_type.lower())
+        return list(bucket.values()) if bucket else []
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the agent storage.
         
+        The result is memoized per snapshot, i.e. until the next mutation.
+        
         Returns:
             Dictionary with storage statistics
         """
         try:
-            agents = self.list_agents()
-            
-            # Count agents by type
-            type_counts = {}
-            for agent in agents:
-                task_type = agent.get("task_type", "unknown")
-                type_counts[task_type] = type_counts.get(task_type, 0) + 1
+            snapshot = self._snapshot
+            cached = self._stats_cache
+            if cached is not None and cached[0] is snapshot:
+                stats = cached[1]
+            else:
+                by_name, by_type = snapshot
+                # Count agents by (normalized) type straight from the index
+                type_counts = {
+                    (task_type or "unknown"): len(agents)
+                    for task_type, agents in by_type.items()
+                }
+                
+                stats = {
+                    "total_agents": len(by_name),
+                    "agents_by_type": type_counts,
+                    "storage_file": self.storage_file
+                }
+                self._stats_cache = (snapshot, stats)
             
-            return {
-                "total_agents": len(agents),
-                "agents_by_type": type_counts,
-                "storage_file": self.storage_file,
-                "file_exists": os.path.exists(self.storage_file)
-            }
+            # Read live: a failed flush can change it without a new snapshot
+            return {**stats, "agents_by_type": dict(stats["agents_by_type"]), "file_exists": self._file_exists}
             
         except Exception as e:
-            logging.error(f"Error getting storage stats: {e}")
+            logger.error("Error getting storage stats: %s", e)
             return {
                 "total_agents": 0,
                 "agents_by_type": {},
@@ -7,12 +7,16 @@ import logging
 from typing import Dict, Any, Optional
 from abc import ABC, abstractmethod
 
+logger = logging.getLogger(__name__)
+
 
 class BaseAgent(ABC):
     """
     Abstract base class for all agents in the system.
     """
     
+    __slots__ = ('name', 'description', 'created_at', 'last_used', '_type_name')
+    
     def __init__(self, name: str, description: str):
         """
         Initialize base agent.
@@ -25,8 +29,9 @@ class BaseAgent(ABC):
         self.description = description
         self.created_at = None
         self.last_used = None
+        self._type_name = type(self).__name__
         
-        logging.info(f"Initialized agent: {name}")
+        logger.info("Initialized agent: %s", name)
     
     def get_info(self) -> Dict[str, Any]:
         """
@@ -40,7 +45,7 @@ class BaseAgent(ABC):
             "description": self.description,
             "created_at": self.created_at,
             "last_used": self.last_used,
-            "type": self.__class__.__name__
+            "type": self._type_name
         }
     
     def to_dict(self) -> Dict[str, Any]:
@@ -55,7 +60,7 @@ class BaseAgent(ABC):
             "description": self.description,
             "created_at": self.created_at,
             "last_used": self.last_used,
-            "type": self.__class__.__name__
+            "type": self._type_name
         }
     
     @abstractmethod
@@ -77,6 +82,8 @@ class SpecializedAgent(BaseAgent):
     A specialized agent created dynamically by the master agent.
     """
     
+    __slots__ = ('system_prompt', 'task_type', '_prefix')
+    
     def __init__(self, name: str, description: str, system_prompt: str, task_type: str):
         """
         Initialize specialized agent.
@@ -90,6 +97,7 @@ class SpecializedAgent(BaseAgent):
         super().__init__(name, description)
         self.system_prompt = system_prompt
         self.task_type = task_type
+        self._prefix = f"[{name}] Processing: "
     
     def process_request(self, request: str) -> str:
         """
@@ -103,7 +111,7 @@ class SpecializedAgent(BaseAgent):
         """
         # This would typically use the AI model with the system prompt
         # For now, return a placeholder response
-        return f"[{self.name}] Processing: {request}"
+        return self._prefix + request
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -112,12 +120,15 @@ class SpecializedAgent(BaseAgent):
         Returns:
             Agent as dictionary including specialized fields
         """
-        base_dict = super().to_dict()
-        base_dict.update({
+        return {
+            "name": self.name,
+            "description": self.description,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "type": self._type_name,
             "system_prompt": self.system_prompt,
             "task_type": self.task_type
-        })
-        return base_dict
+        }
     
     @classmethod
     def from_dict(cls, agent_dict: Dict[str, Any]) -> 'SpecializedAgent':
@@ -97,7 +97,8 @@ def demo_system_workflow():
         
         # Show storage file contents
         try:
-            with open('agents_storage.json', 'r') as f:
+            master_agent.agent_storage.flush()
+            with open('agents_storage.json', 'r', encoding='utf-8') as f:
                 storage_data = json.load(f)
                 agents = storage_data.get('agents', [])
                 
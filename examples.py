@@ -8,80 +8,80 @@ import os
 from master_agent import MasterAgent
 from utils import setup_logging, print_system_stats
 
+_PROGRAMMING_REQUESTS = (
+    "Write a Python function to sort a list of dictionaries by a specific key",
+    "Create a JavaScript function that validates email addresses",
+    "Show me how to implement a binary search algorithm in Python",
+    "Write a SQL query to find the top 5 customers by total orders",
+    "Create a REST API endpoint in Python using Flask"
+)
+
+_CREATIVE_REQUESTS = (
+    "Write a short poem about artificial intelligence",
+    "Create a story about a time traveler who visits ancient Rome",
+    "Write a product description for a smart home device",
+    "Create dialogue for a scene between two detectives",
+    "Write a blog post introduction about sustainable living"
+)
+
+_EDUCATIONAL_REQUESTS = (
+    "Explain how photosynthesis works in simple terms",
+    "What is the difference between machine learning and deep learning?",
+    "Explain the concept of compound interest with examples",
+    "How does blockchain technology work?",
+    "What are the main causes of climate change?"
+)
+
+_ANALYSIS_REQUESTS = (
+    "Analyze the pros and cons of remote work",
+    "Compare different programming paradigms",
+    "What are the key factors to consider when choosing a database?",
+    "Analyze the impact of social media on modern communication",
+    "Compare renewable energy sources and their efficiency"
+)
+
+_MATH_REQUESTS = (
+    "Solve this quadratic equation: x² + 5x + 6 = 0",
+    "Calculate the compound interest on $1000 at 5% for 3 years",
+    "What is the area of a triangle with sides 3, 4, and 5?",
+    "Convert 150 kilometers to miles",
+    "Find the derivative of f(x) = 3x² + 2x + 1"
+)
+
 def example_programming_tasks():
     """Examples of programming-related requests."""
     print("🖥️  Programming Task Examples")
     print("-" * 40)
     
-    programming_requests = [
-        "Write a Python function to sort a list of dictionaries by a specific key",
-        "Create a JavaScript function that validates email addresses",
-        "Show me how to implement a binary search algorithm in Python",
-        "Write a SQL query to find the top 5 customers by total orders",
-        "Create a REST API endpoint in Python using Flask"
-    ]
-    
-    return programming_requests
+    return _PROGRAMMING_REQUESTS
 
 def example_creative_tasks():
     """Examples of creative writing requests."""
     print("🎨 Creative Writing Examples")
     print("-" * 40)
     
-    creative_requests = [
-        "Write a short poem about artificial intelligence",
-        "Create a story about a time traveler who visits ancient Rome",
-        "Write a product description for a smart home device",
-        "Create dialogue for a scene between two detectives",
-        "Write a blog post introduction about sustainable living"
-    ]
-    
-    return creative_requests
+    return _CREATIVE_REQUESTS
 
 def example_educational_tasks():
     """Examples of educational and explanatory requests."""
     print("📚 Educational Examples")
     print("-" * 40)
     
-    educational_requests = [
-        "Explain how photosynthesis works in simple terms",
-        "What is the difference between machine learning and deep learning?",
-        "Explain the concept of compound interest with examples",
-        "How does blockchain technology work?",
-        "What are the main causes of climate change?"
-    ]
-    
-    return educational_requests
+    return _EDUCATIONAL_REQUESTS
 
 def example_analysis_tasks():
     """Examples of analytical and research requests."""
     print("🔍 Analysis Examples")
     print("-" * 40)
     
-    analysis_requests = [
-        "Analyze the pros and cons of remote work",
-        "Compare different programming paradigms",
-        "What are the key factors to consider when choosing a database?",
-        "Analyze the impact of social media on modern communication",
-        "Compare renewable energy sources and their efficiency"
-    ]
-    
-    return analysis_requests
+    return _ANALYSIS_REQUESTS
 
 def example_math_tasks():
     """Examples of mathematical problem-solving requests."""
     print("🧮 Mathematics Examples")
     print("-" * 40)
     
-    math_requests = [
-        "Solve this quadratic equation: x² + 5x + 6 = 0",
-        "Calculate the compound interest on $1000 at 5% for 3 years",
-        "What is the area of a triangle with sides 3, 4, and 5?",
-        "Convert 150 kilometers to miles",
-        "Find the derivative of f(x) = 3x² + 2x + 1"
-    ]
-    
-    return math_requests
+    return _MATH_REQUESTS
 
 def run_interactive_examples():
     """Run examples interactively with user choice."""
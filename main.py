@@ -5,16 +5,12 @@ Provides a terminal-based interface for interacting with the master agent.
 """
 
 import logging
-import os
 from dotenv import load_dotenv
 import sys
-from master_agent import MasterAgent
 from utils import setup_logging
 
 load_dotenv()
 
-os.environ['GEMINI_API_KEY'] = os.getenv('GEMINI_API_KEY')
-    
 
 """
 Meet Jungle of Agents, create a jungle of Agents
@@ -34,6 +30,8 @@ def main():
     
     # Initialize master agent
     try:
+        # Imported here so the banner shows before the Gemini client and NumPy load
+        from master_agent import MasterAgent
         master_agent = MasterAgent()
         print("✅ Master agent initialized successfully!")
         print("-" * 60)
@@ -59,17 +57,20 @@ def main():
             print("\n🤖 Processing your request...")
             print("-" * 40)
             
-            # Process the request through master agent
-            response = master_agent.process_request(user_input)
-            
-            print(f"\n✨ Master Agent: {response}")
+            # Process the request through master agent, printing the response as it streams in
+            chunks = master_agent.stream_request(user_input)
+            first_chunk = next(chunks, "")
+            print(f"\n✨ Master Agent: {first_chunk}", end="", flush=True)
+            for chunk in chunks:
+                print(chunk, end="", flush=True)
+            print()
             print("-" * 60)
             
         except KeyboardInterrupt:
             print("\n\n👋 Goodbye! Thanks for using the AI Agents System.")
             break
         except Exception as e:
-            logging.error(f"Error processing request: {e}")
+            logging.error("Error processing request: %s", e)
             print(f"\n❌ Error: {e}")
             print("Please try again with a different request.")
 
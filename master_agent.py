@@ -3,16 +3,166 @@ Master Agent implementation.
 Handles user requests, delegates tasks to specialized agents, and manages agent creation.
 """
 
-import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Literal, Optional, Tuple, Type, TypeVar
 from google import genai
 from google.genai import types
-import os
+from pydantic import BaseModel
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from base_agent import BaseAgent
 from agent_storage import AgentStorage
 from similarity_search import SimilaritySearch
+from utils import get_api_key
+
+logger = logging.getLogger(__name__)
+
+# Parsed JSON responses are reused for identical prompts within this window
+LLM_CACHE_SIZE = 1024
+LLM_CACHE_TTL = 3600.0
+
+# Final responses are reused for repeated requests, matched by embedding
+# similarity when sentence embeddings are available
+RESPONSE_CACHE_SIZE = 500
+RESPONSE_CACHE_THRESHOLD = 0.9
+
+# Numbers in a request; similar requests with different numbers never share a response
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class AgentSpec(BaseModel):
+    """Specification of a new specialized agent, as returned by the model."""
+    name: str
+    description: str
+    system_prompt: str
+    task_type: str
+
+
+class TaskAnalysis(BaseModel):
+    """Task requirements of a user request, as returned by the model."""
+    task_type: str
+    agent_description: str
+    complexity: Literal["simple", "complex"]
+    requires_delegation: bool
+    # Agent proposed for the task, used if no existing agent is similar enough
+    new_agent_spec: Optional[AgentSpec] = None
+
+
+class _TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after a fixed TTL.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: Any, value: Any):
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class _FailedText(str):
+    """Response text reporting a failure rather than an answer; never cached."""
+
+
+class _ResponseCache:
+    """
+    Thread-safe LRU cache of final responses to user requests.
+    
+    Requests match when their normalized text is identical or, if embeddings
+    are given, when their embeddings' cosine similarity reaches the threshold
+    and they contain the same numbers.
+    """
+    
+    def __init__(self, maxsize: int, threshold: float):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # Normalized request -> (embedding or None, response)
+        self._entries: OrderedDict = OrderedDict()
+        # Keys and stacked embeddings of the entries, rebuilt after changes
+        self._matrix: Optional[Tuple[List[str], Any]] = None
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, embedding: Optional[Any] = None) -> Optional[str]:
+        """
+        Find the cached response for a request.
+        
+        Args:
+            key: Normalized request text
+            embedding: Unit-length embedding of the request, if available
+            
+        Returns:
+            Cached response, or None if no cached request matches
+        """
+        with self._lock:
+            if key not in self._entries and embedding is not None:
+                closest = self._closest_key(embedding)
+                # "Convert 150 km" and "Convert 160 km" embed alike but need different answers
+                if closest is not None and _NUMBER_RE.findall(closest) == _NUMBER_RE.findall(key):
+                    key = closest
+            if key not in self._entries:
+                return None
+            
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+    
+    def _closest_key(self, embedding: Any) -> Optional[str]:
+        """Key of the most similar cached request above the threshold, if any."""
+        if self._matrix is None:
+            keys = [key for key, (cached, _) in self._entries.items() if cached is not None]
+            rows = [self._entries[key][0] for key in keys]
+            self._matrix = (keys, np.stack(rows) if rows else None)
+        
+        keys, matrix = self._matrix
+        if matrix is None:
+            return None
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+    
+    def put(self, key: str, embedding: Optional[Any], response: str):
+        """Store the response for a request, evicting the least recently used if full."""
+        with self._lock:
+            self._entries[key] = (embedding, response)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._matrix = None
 
 
 class MasterAgent(BaseAgent):
@@ -27,13 +177,26 @@ class MasterAgent(BaseAgent):
             description="Master coordinator agent that delegates tasks to specialized agents"
         )
         
+        self._api_key = get_api_key()
+        if not self._api_key:
+            raise RuntimeError(
+                "GEMINI_API_KEY not set. Get an API key from https://aistudio.google.com/ "
+                "and set it in the environment or in a .env file."
+            )
+        
         self.agent_storage = AgentStorage()
-        self.similarity_search = SimilaritySearch()
+        self.similarity_search = SimilaritySearch(embeddings_file="agents_embeddings.npy")
         
         # Initialize Gemini client
-        self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+        self.client = genai.Client(api_key=self._api_key)
+        self._json_cache = _TTLCache(LLM_CACHE_SIZE, LLM_CACHE_TTL)
+        self._response_cache = _ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_THRESHOLD)
+        # Prepares the similarity search while the task analysis request is in flight;
+        # the search keeps caches, so concurrent requests take turns using it
+        self._prepare_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity-prepare")
+        self._search_lock = threading.Lock()
         
-        logging.info("Master agent initialized")
+        logger.info("Master agent initialized")
     
     def process_request(self, request: str) -> str:
         """
@@ -45,38 +208,150 @@ class MasterAgent(BaseAgent):
         Returns:
             Response from the delegated agent or master agent
         """
-        logging.info(f"Processing user request: {request[:100]}...")
+        return "".join(self.stream_request(request))
+    
+    def stream_request(self, request: str) -> Iterator[str]:
+        """
+        Process user request like process_request, yielding the response as it is generated.
+        
+        Args:
+            request: The user's input request
+            
+        Yields:
+            Successive chunks of the response from the delegated agent or master agent
+        """
+        logger.info("Processing user request: %s...", request[:100])
         
         try:
+            # Answer repeated requests from the response cache
+            cache_key = " ".join(request.lower().split())
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Response cache hit")
+                yield cached
+                return
+            
+            # Index the stored agents and embed the request in the background
+            # while the model analyzes the request
+            prepared = self._prepare_executor.submit(
+                self._prepare_search, self.agent_storage.list_agents(), request
+            )
+            
             # Analyze the request to determine task requirements
             task_analysis = self._analyze_task(request)
             
+            # Answer requests worded differently from a cached one before delegating
+            try:
+                embedding = prepared.result()
+            except Exception as e:
+                logger.warning("Preparing the similarity search failed: %s", e)
+                embedding = None
+            if embedding is not None:
+                cached = self._response_cache.get(cache_key, embedding)
+                if cached is not None:
+                    logger.info("Response cache hit (similar request)")
+                    yield cached
+                    return
+            
             # Find or create appropriate agent
             agent = self._find_or_create_agent(task_analysis)
             
             # Delegate task to the agent
             if agent:
                 print(f"🔄 Delegating to agent: {agent['name']}")
-                response = self._delegate_task(agent, request, task_analysis)
+                chunks = self._delegate_task(agent, request, task_analysis)
             else:
                 # Handle the task directly if no specialized agent is needed
-                response = self._handle_directly(request)
+                chunks = self._handle_directly(request)
+            
+            response = []
+            for chunk in chunks:
+                response.append(chunk)
+                yield chunk
             
-            return response
+            if not any(isinstance(chunk, _FailedText) for chunk in response):
+                self._response_cache.put(cache_key, embedding, "".join(response))
             
         except Exception as e:
-            logging.error(f"Error processing request: {e}")
-            return f"I encountered an error while processing your request: {e}"
+            logger.error("Error processing request: %s", e)
+            yield f"I encountered an error while processing your request: {e}"
     
-    def _analyze_task(self, user_prompt: str) -> Dict[str, Any]:
+    def _prepare_search(self, agents: List[Dict[str, Any]], request: str) -> Optional[Any]:
+        """
+        Build the similarity search structures for agents ahead of the search.
+        
+        Args:
+            agents: Stored agents
+            request: The user's input request
+            
+        Returns:
+            Embedding of the request for the response cache, or None if unavailable
+        """
+        with self._search_lock:
+            self.similarity_search.prepare(agents)
+            return self.similarity_search.embed_text(request)
+    
+    async def aprocess_request(self, request: str) -> str:
+        """
+        Process a user request without blocking the event loop.
+        
+        Runs process_request in the loop's default executor, so several
+        requests can wait on the model concurrently.
+        
+        Args:
+            request: The user's input request
+            
+        Returns:
+            Response from the delegated agent or master agent
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process_request, request)
+    
+    def _generate_json(self, prompt: str, schema: Type[ModelT]) -> ModelT:
+        """
+        Run a schema-constrained Gemini request, reusing parsed results for repeated prompts.
+        
+        Args:
+            prompt: The prompt to send
+            schema: Pydantic model the response must conform to
+            
+        Returns:
+            Validated response (shared with the cache, so treat it as read-only)
+        """
+        key = (schema.__name__, hashlib.sha256(prompt.encode('utf-8')).digest())
+        cached = self._json_cache.get(key)
+        if cached is not None:
+            logger.debug("LLM cache hit")
+            return cached
+        
+        response = self.client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=schema
+            )
+        )
+        
+        if not response.text:
+            raise ValueError("Empty response from model")
+        
+        parsed = schema.model_validate_json(response.text)
+        self._json_cache.put(key, parsed)
+        return parsed
+    
+    def _analyze_task(self, user_prompt: str) -> TaskAnalysis:
         """
         Analyze the user prompt to understand task requirements.
         
+        The same request also asks for the spec of a new agent able to handle the
+        task, so that creating one does not need a second model call.
+        
         Args:
             user_prompt: The user's input
             
         Returns:
-            Dictionary containing task analysis
+            Task analysis, including the proposed agent when delegation is needed
         """
         analysis_prompt = f"""
         Analyze this user request and determine what type of specialized agent would be best suited to handle it.
@@ -88,37 +363,32 @@ class MasterAgent(BaseAgent):
         2. agent_description: A brief description of what kind of agent would handle this (e.g., "Python programming assistant", "Creative writing helper")
         3. complexity: "simple" or "complex" 
         4. requires_delegation: true if this needs a specialized agent, false if master can handle directly
+        5. new_agent_spec: null if requires_delegation is false, otherwise a specialized AI agent for this task, as an object with
+           - name: A concise name for the agent (e.g., "PythonCodingAgent", "CreativeWritingAgent")
+           - description: Detailed description of the agent's capabilities and specialization
+           - system_prompt: A comprehensive system prompt that defines the agent's role, expertise, and behavior
+           - task_type: The type of tasks this agent specializes in
+           Make the agent highly specialized and expert in its domain.
         
         Respond only with valid JSON.
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=analysis_prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            analysis = self._generate_json(analysis_prompt, TaskAnalysis)
+            logger.info("Task analysis: %s", analysis)
+            return analysis
             
-            if response.text:
-                analysis = json.loads(response.text)
-                logging.info(f"Task analysis: {analysis}")
-                return analysis
-            else:
-                raise ValueError("Empty response from analysis")
-                
         except Exception as e:
-            logging.error(f"Error analyzing task: {e}")
+            logger.error("Error analyzing task: %s", e)
             # Fallback analysis
-            return {
-                "task_type": "general",
-                "agent_description": "General purpose assistant",
-                "complexity": "simple",
-                "requires_delegation": False
-            }
+            return TaskAnalysis(
+                task_type="general",
+                agent_description="General purpose assistant",
+                complexity="simple",
+                requires_delegation=False
+            )
     
-    def _find_or_create_agent(self, task_analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _find_or_create_agent(self, task_analysis: TaskAnalysis) -> Optional[Dict[str, Any]]:
         """
         Find existing agent or create new one based on task analysis.
         
@@ -128,34 +398,54 @@ class MasterAgent(BaseAgent):
         Returns:
             Agent dictionary or None if master should handle directly
         """
-        if not task_analysis.get("requires_delegation", False):
+        if not task_analysis.requires_delegation:
             return None
         
-        agent_description = task_analysis.get("agent_description", "")
-        print(agent_description, ' ::::::::agent_description')
+        agent_description = task_analysis.agent_description
+        logger.debug("Searching agents for: %s", agent_description)
         # Search for existing similar agent
-        existing_agent = self.similarity_search.find_similar_agent(
-            agent_description, 
-            self.agent_storage.list_agents()
-        )
+        with self._search_lock:
+            existing_agent = self.similarity_search.find_similar_agent(
+                agent_description, 
+                self.agent_storage.list_agents()
+            )
         
         if existing_agent:
             print(f"📋 Found existing agent: {existing_agent['name']}")
-            logging.info(f"Using existing agent: {existing_agent['name']}")
+            logger.info("Using existing agent: %s", existing_agent['name'])
             return existing_agent
         
-        # Create new agent if none found
+        # Create new agent if none found, from the spec proposed with the analysis when usable
         print(f"🔨 Creating new specialized agent...")
-        new_agent = self._create_new_agent(task_analysis)
+        new_agent = self._agent_from_spec(task_analysis.new_agent_spec)
+        if new_agent is None:
+            new_agent = self._create_new_agent(task_analysis)
         
         if new_agent:
             self.agent_storage.save_agent(new_agent)
             print(f"✅ Created and saved new agent: {new_agent['name']}")
-            logging.info(f"Created new agent: {new_agent['name']}")
+            logger.info("Created new agent: %s", new_agent['name'])
         
         return new_agent
     
-    def _create_new_agent(self, task_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def _agent_from_spec(self, spec: Optional[AgentSpec]) -> Optional[Dict[str, Any]]:
+        """
+        Build a new agent from the spec returned alongside the task analysis.
+        
+        Args:
+            spec: Agent spec from the task analysis
+            
+        Returns:
+            New agent dictionary, or None if the spec is missing or incomplete
+        """
+        if spec is None or not spec.name or not spec.system_prompt:
+            return None
+        
+        agent_data = spec.model_dump()
+        agent_data['created_by'] = 'MasterAgent'
+        return agent_data
+    
+    def _create_new_agent(self, task_analysis: TaskAnalysis) -> Dict[str, Any]:
         """
         Create a new specialized agent based on task analysis.
         
@@ -168,9 +458,9 @@ class MasterAgent(BaseAgent):
         agent_creation_prompt = f"""
         Create a specialized AI agent based on this task analysis:
         
-        Task Type: {task_analysis.get('task_type', 'general')}
-        Agent Description: {task_analysis.get('agent_description', 'General assistant')}
-        Complexity: {task_analysis.get('complexity', 'simple')}
+        Task Type: {task_analysis.task_type}
+        Agent Description: {task_analysis.agent_description}
+        Complexity: {task_analysis.complexity}
         
         Please provide a JSON response with:
         1. name: A concise name for the agent (e.g., "PythonCodingAgent", "CreativeWritingAgent")
@@ -183,33 +473,44 @@ class MasterAgent(BaseAgent):
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=agent_creation_prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            agent_data = self._generate_json(agent_creation_prompt, AgentSpec).model_dump()
+            agent_data['created_by'] = 'MasterAgent'
+            return agent_data
             
-            if response.text:
-                agent_data = json.loads(response.text)
-                agent_data['created_by'] = 'MasterAgent'
-                return agent_data
-            else:
-                raise ValueError("Empty response from agent creation")
-                
         except Exception as e:
-            logging.error(f"Error creating new agent: {e}")
+            logger.error("Error creating new agent: %s", e)
             # Fallback agent creation
             return {
-                "name": f"{task_analysis.get('task_type', 'General')}Agent",
-                "description": task_analysis.get('agent_description', 'General purpose assistant'),
-                "system_prompt": f"You are a helpful assistant specializing in {task_analysis.get('task_type', 'general tasks')}.",
-                "task_type": task_analysis.get('task_type', 'general'),
+                "name": f"{task_analysis.task_type or 'General'}Agent",
+                "description": task_analysis.agent_description or 'General purpose assistant',
+                "system_prompt": f"You are a helpful assistant specializing in {task_analysis.task_type or 'general tasks'}.",
+                "task_type": task_analysis.task_type or 'general',
                 "created_by": "MasterAgent"
             }
     
-    def _delegate_task(self, agent: Dict[str, Any], user_prompt: str, task_analysis: Dict[str, Any]) -> str:
+    def _stream_text(self, prompt: str, system_instruction: str) -> Iterator[str]:
+        """
+        Stream a plain-text Gemini response.
+        
+        Args:
+            prompt: The prompt to send
+            system_instruction: Role and behavior instructions for the model
+            
+        Yields:
+            Non-empty text chunks as they arrive
+        """
+        stream = self.client.models.generate_content_stream(
+            model="gemini-2.5-flash",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction
+            )
+        )
+        for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+    
+    def _delegate_task(self, agent: Dict[str, Any], user_prompt: str, task_analysis: TaskAnalysis) -> Iterator[str]:
         """
         Delegate task to a specialized agent.
         
@@ -218,14 +519,15 @@ class MasterAgent(BaseAgent):
             user_prompt: Original user prompt
             task_analysis: Analysis of the task
             
-        Returns:
-            Response from the delegated agent
+        Yields:
+            Successive chunks of the response from the delegated agent
         """
-        delegation_prompt = f"""
+        system_instruction = f"""
         {agent.get('system_prompt', '')}
         
         You are {agent.get('name', 'SpecializedAgent')} and you specialize in: {agent.get('description', '')}
-        
+        """
+        delegation_prompt = f"""
         Please handle this user request with your specialized expertise:
         
         User Request: {user_prompt}
@@ -234,49 +536,44 @@ class MasterAgent(BaseAgent):
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=delegation_prompt
-            )
+            responded = False
+            for text in self._stream_text(delegation_prompt, system_instruction):
+                responded = True
+                yield text
             
-            if response.text:
-                return response.text
-            else:
-                return "The specialized agent was unable to provide a response."
+            if not responded:
+                yield _FailedText("The specialized agent was unable to provide a response.")
                 
         except Exception as e:
-            logging.error(f"Error delegating to agent {agent.get('name')}: {e}")
-            return f"Error occurred while delegating to {agent.get('name')}: {e}"
+            logger.error("Error delegating to agent %s: %s", agent.get('name'), e)
+            yield _FailedText(f"Error occurred while delegating to {agent.get('name')}: {e}")
     
-    def _handle_directly(self, user_prompt: str) -> str:
+    def _handle_directly(self, user_prompt: str) -> Iterator[str]:
         """
         Handle simple requests directly without delegation.
         
         Args:
             user_prompt: The user's request
             
-        Returns:
-            Direct response from master agent
+        Yields:
+            Successive chunks of the direct response from master agent
         """
+        system_instruction = "You are the Master Agent of an AI agents system. Handle requests directly."
         direct_prompt = f"""
-        You are the Master Agent of an AI agents system. Handle this request directly:
-        
         User Request: {user_prompt}
         
         Provide a helpful and comprehensive response.
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=direct_prompt
-            )
+            responded = False
+            for text in self._stream_text(direct_prompt, system_instruction):
+                responded = True
+                yield text
             
-            if response.text:
-                return response.text
-            else:
-                return "I'm unable to process your request at the moment."
+            if not responded:
+                yield _FailedText("I'm unable to process your request at the moment.")
                 
         except Exception as e:
-            logging.error(f"Error handling request directly: {e}")
-            return f"I encountered an error: {e}"
+            logger.error("Error handling request directly: %s", e)
+            yield _FailedText(f"I encountered an error: {e}")
@@ -6,6 +6,8 @@ Setup script for AI Agents System.
 import os
 import sys
 
+from utils import get_api_key
+
 def check_python_version():
     """Check if Python version is compatible."""
     if sys.version_info < (3, 8):
@@ -41,7 +43,7 @@ def check_dependencies():
 
 def check_api_key():
     """Check if GEMINI_API_KEY is set."""
-    api_key = os.getenv('GEMINI_API_KEY')
+    api_key = get_api_key()
     if not api_key:
         print("❌ GEMINI_API_KEY environment variable not set")
         print("\nTo set your API key:")
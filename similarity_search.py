@@ -3,27 +3,242 @@ Similarity Search System.
 Implements vector-based similarity search to find the most suitable existing agent.
 """
 
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib.util
+import json
 import logging
-import numpy as np
-from typing import List, Dict, Any, Optional
+import math
+import os
+from collections import Counter
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Optional, Sequence, Tuple
 import re
 
+# NumPy vectorizes the scan over agents; without it agents are scored one by one
+if importlib.util.find_spec("numpy") is not None:
+    import numpy as np
+else:
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Weights of the Jaccard, keyword overlap and cosine metrics in the final score
+METRIC_WEIGHTS = (0.4, 0.3, 0.3)
+
+# Sentence embedding model, used instead of the lexical metrics when
+# sentence-transformers is installed
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDINGS_AVAILABLE = np is not None and importlib.util.find_spec("sentence_transformers") is not None
+
+# Agent embeddings are projected onto their principal components once there are
+# enough agents for the reduced dot products to pay off
+PCA_MIN_AGENTS = 50
+PCA_COMPONENTS = 64
+
+# Descriptions whose 64-bit SimHashes differ in at most this many bits are
+# candidate duplicates; a candidate only counts as the same description if its
+# word set also has at least this Jaccard similarity to the query's
+SIMHASH_MAX_DISTANCE = 5
+SIMHASH_MIN_JACCARD = 0.9
+
+logger = logging.getLogger(__name__)
+
+# Runs of anything but lowercase letters and digits, applied to lowercased text
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+@functools.lru_cache(maxsize=2048)
+def _normalize(text: str) -> str:
+    """Lowercase text and collapse non-alphanumeric runs into single spaces."""
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+@functools.lru_cache(maxsize=2048)
+def _words(text: str) -> Tuple[str, ...]:
+    """Split normalized text into words."""
+    return tuple(_normalize(text).split())
+
+
+def _quantize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize each row of a float matrix to int8 with its own scale.
+    
+    Args:
+        matrix: (rows, columns) float matrix, or a single vector
+        
+    Returns:
+        int8 values and float32 scales such that values * scales approximates matrix
+    """
+    scales = np.abs(matrix).max(axis=-1, keepdims=True) / 127
+    scales[scales == 0] = 1
+    values = np.round(matrix / scales).astype(np.int8)
+    return values, np.squeeze(scales, axis=-1).astype(np.float32)
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _scan_scores(offsets, word_ids, word_counts, token_counts, keyword_counts, norms,
+                     is_keyword, query_counts, n_tokens, n_keywords, query_norm, weights):
+        """Compiled equivalent of SimilaritySearch._score_agents over the sparse agent rows."""
+        n_agents = len(offsets) - 1
+        scores = np.empty(n_agents)
+        for agent in prange(n_agents):
+            shared_tokens = 0
+            shared_keywords = 0
+            dot_product = 0.0
+            for position in range(offsets[agent], offsets[agent + 1]):
+                word = word_ids[position]
+                query_count = query_counts[word]
+                if query_count > 0:
+                    shared_tokens += 1
+                    if is_keyword[word]:
+                        shared_keywords += 1
+                    dot_product += word_counts[position] * query_count
+            
+            union = token_counts[agent] + n_tokens - shared_tokens
+            if n_tokens == 0 and token_counts[agent] == 0:
+                jaccard = 1.0
+            elif union > 0:
+                jaccard = shared_tokens / union
+            else:
+                jaccard = 0.0
+            
+            if n_keywords == 0 and keyword_counts[agent] == 0:
+                keyword_overlap = 1.0
+            elif n_keywords == 0 or keyword_counts[agent] == 0:
+                keyword_overlap = 0.0
+            else:
+                keyword_overlap = shared_keywords / max(keyword_counts[agent], n_keywords)
+            
+            magnitude = norms[agent] * query_norm
+            if query_norm == 0 and norms[agent] == 0:
+                cosine = 1.0
+            elif magnitude > 0:
+                cosine = dot_product / magnitude
+            else:
+                cosine = 0.0
+            
+            scores[agent] = min(weights[0] * jaccard + weights[1] * keyword_overlap + weights[2] * cosine, 1.0)
+        return scores
+else:
+    _scan_scores = None
+
+
+def _argmax(values: Sequence[float]) -> int:
+    """Position of the first largest value."""
+    if np is not None:
+        return int(np.argmax(values))
+    return max(range(len(values)), key=values.__getitem__)
+
+
+def _description_hash(text: str) -> bytes:
+    """Hash the normalized text, so cosmetic differences map to the same key."""
+    return hashlib.blake2b(_normalize(text).encode('utf-8'), digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=8192)
+def _token_hash(word: str) -> int:
+    """64-bit hash of a single word."""
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _simhash(text: str) -> int:
+    """
+    Compute the 64-bit SimHash of a text's words.
+    
+    Texts sharing most of their words get hashes that differ in few bits.
+    """
+    weights = [0] * 64
+    for word, count in Counter(_words(text)).items():
+        word_hash = _token_hash(word)
+        for bit in range(64):
+            weights[bit] += count if word_hash >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+class TextFeatures(NamedTuple):
+    """Tokenized form of a text, precomputed once for similarity scoring."""
+    tokens: FrozenSet[str]
+    keywords: FrozenSet[str]
+    counts: Counter
+
+
+class DescriptionIndex(NamedTuple):
+    """Hashes of agent descriptions, for spotting (near-)duplicate queries."""
+    descriptions: Tuple[str, ...]
+    exact: Dict[bytes, int]     # normalized description hash -> agent position
+    positions: Tuple[int, ...]  # positions of agents with a non-empty description
+    simhashes: Sequence[int]    # SimHash of each of those descriptions (uint64 array with NumPy)
+
+
+class AgentIndex(NamedTuple):
+    """Sparse term counts over a fixed list of agents, for vectorized scoring."""
+    texts: Tuple[str, ...]
+    vocab: Dict[str, int]
+    token_counts: np.ndarray    # distinct tokens per agent
+    keyword_counts: np.ndarray  # distinct keywords per agent
+    norms: np.ndarray           # L2 norm of each agent's count vector
+    # Each agent's distinct words and their counts, as back-to-back rows
+    offsets: np.ndarray         # (agents + 1,) start of each agent's words
+    rows: np.ndarray            # agent of each (agent, word) entry
+    word_ids: np.ndarray        # vocab index of each (agent, word) entry
+    word_counts: np.ndarray     # count of each (agent, word) entry
+    is_keyword: np.ndarray      # (vocab,) whether the word is a keyword
+
 
 class SimilaritySearch:
     """
     Performs similarity search to find the best matching agent for a given task.
-    Uses simple text-based similarity metrics.
+    Uses cosine similarity of sentence embeddings when sentence-transformers is
+    installed, and simple text-based similarity metrics otherwise.
     """
     
-    def __init__(self, similarity_threshold: float = 0.09):
+    def __init__(self, similarity_threshold: float = 0.09, embedding_threshold: float = 0.6,
+                 use_embeddings: bool = True, embeddings_file: Optional[str] = None,
+                 quantize_embeddings: bool = False):
         """
         Initialize similarity search.
         
         Args:
-            similarity_threshold: Minimum similarity score to consider a match
+            similarity_threshold: Minimum text-based similarity score to consider a match
+            embedding_threshold: Minimum embedding cosine similarity to consider a match
+            use_embeddings: Use sentence embeddings when sentence-transformers is available
+            embeddings_file: .npy file to keep agent embeddings in between runs, if any
+            quantize_embeddings: Search an int8 copy of the agent matrix, a quarter
+                of the float32 size, with scores within about 0.005
         """
         self.similarity_threshold = similarity_threshold
-        logging.info(f"Similarity search initialized with threshold: {similarity_threshold}")
+        self.embedding_threshold = embedding_threshold
+        # Agent text -> precomputed features, so agents are tokenized only once
+        self._agent_features: Dict[str, TextFeatures] = {}
+        self._index: Optional[AgentIndex] = None
+        self._description_index: Optional[DescriptionIndex] = None
+        # Last agent list seen, with the texts and descriptions of its agents
+        self._agent_keys_cache: Optional[Tuple[List[Dict[str, Any]], int, Tuple[str, ...], Tuple[str, ...]]] = None
+        
+        # Embedding model is loaded on first search; None once it is known to be unusable
+        self._use_embeddings = use_embeddings and EMBEDDINGS_AVAILABLE
+        self._model = None
+        # Agent text -> normalized embedding, and the stacked matrix for the last agent list
+        self._embeddings: Dict[str, np.ndarray] = {}
+        self._embedding_matrix: Optional[Tuple[Tuple[str, ...], np.ndarray]] = None
+        # Agent texts and memory-mapped matrix last written to / read from embeddings_file
+        self.embeddings_file = embeddings_file
+        self._persisted: Optional[Tuple[Tuple[str, ...], np.ndarray]] = None
+        self._persisted_loaded = False
+        # PCA components (k, D) with the agent count they were fitted on, and the
+        # agent matrix projected onto them
+        self._pca: Optional[Tuple[np.ndarray, int]] = None
+        self._projected_matrix: Optional[np.ndarray] = None
+        # int8 agent matrix and per-row scales, replacing the float matrix when quantizing
+        self.quantize_embeddings = quantize_embeddings
+        self._quantized_matrix: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        logger.info("Similarity search initialized with threshold: %s", similarity_threshold)
     
     def find_similar_agent(self, query_description: str, agents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """
@@ -37,143 +252,468 @@ class SimilaritySearch:
             Most similar agent if similarity exceeds threshold, None otherwise
         """
         if not agents:
-            logging.info("No agents available for similarity search")
+            logger.info("No agents available for similarity search")
             return None
         
         best_agent = None
         best_score = 0.09
         
-        logging.info(f"Searching for agent similar to: {query_description}")
+        logger.info("Searching for agent similar to: %s", query_description)
+        
+        duplicate = self._find_duplicate(query_description, agents)
+        if duplicate is not None:
+            logger.info("Found agent with the same description: %s", duplicate.get('name'))
+            return duplicate
+        
+        embedding_scores = self._score_embeddings(query_description, agents)
+        if embedding_scores is not None:
+            self._log_scores(agents, embedding_scores)
+            best_index = _argmax(embedding_scores)
+            best_score = float(embedding_scores[best_index])
+            if best_score >= self.embedding_threshold:
+                best_agent = agents[best_index]
+                logger.info("Found similar agent: %s (embedding score: %.3f)", best_agent.get('name'), best_score)
+                return best_agent
+            logger.info("No similar agent found (best embedding score: %.3f, threshold: %s)", best_score, self.embedding_threshold)
+            return None
+        
+        scores = self._score_agents(self._text_features(query_description), agents)
+        self._log_scores(agents, scores)
+        
+        # First agent with the highest score wins, as long as it beats the floor
+        best_index = _argmax(scores)
+        if scores[best_index] > best_score:
+            best_score = float(scores[best_index])
+            best_agent = agents[best_index]
         
-        print(query_description, '::::::query_descriptionquery_description')
-        for agent in agents:
-            
-            # Calculate similarity score
-            score = self._calculate_similarity(query_description, agent)
-            print(score, ' ::::::score')
-            logging.debug(f"Agent '{agent.get('name', 'Unknown')}' similarity score: {score:.3f}")
-            
-            if score > best_score:
-                best_score = score
-                best_agent = agent
-            print(best_agent, ' ::::::best_agent')
-            print(self.similarity_threshold, ' ::::::self.similarity_threshold')
         # Check if best score meets threshold
         if best_score >= self.similarity_threshold and best_agent:
-            logging.info(f"Found similar agent: {best_agent.get('name')} (score: {best_score:.3f})")
+            logger.info("Found similar agent: %s (score: %.3f)", best_agent.get('name'), best_score)
             return best_agent
         else:
-            logging.info(f"No similar agent found (best score: {best_score:.3f}, threshold: {self.similarity_threshold})")
+            logger.info("No similar agent found (best score: %.3f, threshold: %s)", best_score, self.similarity_threshold)
+            return None
+    
+    def _find_duplicate(self, query: str, agents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Find an agent whose description is the query up to cosmetic differences.
+        
+        Checks for an identical normalized description first, then for a
+        description whose SimHash is within SIMHASH_MAX_DISTANCE bits and
+        whose words have a Jaccard similarity of at least SIMHASH_MIN_JACCARD,
+        so descriptions differing in a meaningful word are not merged.
+        
+        Args:
+            query: Query description
+            agents: List of available agents
+            
+        Returns:
+            The first matching agent, or None if no description is close enough
+        """
+        if not _normalize(query):
+            return None
+        
+        descriptions = self._agent_keys(agents)[1]
+        index = self._description_index
+        if index is None or index.descriptions != descriptions:
+            # Agents without a description never count as duplicates
+            positions = [position for position, description in enumerate(descriptions) if _normalize(description)]
+            exact: Dict[bytes, int] = {}
+            for position in positions:
+                exact.setdefault(_description_hash(descriptions[position]), position)
+            simhashes = [_simhash(descriptions[position]) for position in positions]
+            index = self._description_index = DescriptionIndex(
+                descriptions=descriptions,
+                exact=exact,
+                positions=tuple(positions),
+                simhashes=np.array(simhashes, dtype=np.uint64) if np is not None else simhashes
+            )
+        
+        position = index.exact.get(_description_hash(query))
+        if position is not None:
+            return agents[position]
+        if not index.positions:
+            return None
+        
+        # Hamming distance to every description: XOR, then count the set bits
+        query_hash = _simhash(query)
+        if np is not None:
+            differing = np.unpackbits((index.simhashes ^ np.uint64(query_hash)).view(np.uint8))
+            distances = differing.reshape(-1, 64).sum(axis=1)
+        else:
+            distances = [bin(simhash ^ query_hash).count('1') for simhash in index.simhashes]
+        if np is not None:
+            candidates = np.flatnonzero(distances <= SIMHASH_MAX_DISTANCE).tolist()
+        else:
+            candidates = [i for i, distance in enumerate(distances) if distance <= SIMHASH_MAX_DISTANCE]
+        candidates.sort(key=lambda i: distances[i])
+        
+        # SimHash only shortlists; confirm that the words themselves nearly agree
+        query_tokens = self._text_features(query).tokens
+        for candidate in candidates:
+            position = index.positions[candidate]
+            tokens = self._text_features(descriptions[position]).tokens
+            if self._jaccard_similarity(query_tokens, tokens) >= SIMHASH_MIN_JACCARD:
+                return agents[position]
+        return None
+    
+    def _log_scores(self, agents: List[Dict[str, Any]], scores: Sequence[float]):
+        """Log the score of every agent when debug logging is enabled."""
+        if logger.isEnabledFor(logging.DEBUG):
+            for agent, score in zip(agents, map(float, scores)):
+                logger.debug("Agent '%s' similarity score: %.3f", agent.get('name', 'Unknown'), score)
+    
+    def _get_model(self):
+        """
+        Load the sentence embedding model on first use.
+        
+        Returns:
+            SentenceTransformer model, or None if embeddings are disabled or unavailable
+        """
+        if self._model is None and self._use_embeddings:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(EMBEDDING_MODEL)
+                logger.info("Loaded embedding model: %s", EMBEDDING_MODEL)
+            except Exception as e:
+                logger.warning("Embedding model unavailable, using text-based similarity: %s", e)
+                self._use_embeddings = False
+        return self._model
+    
+    def embed_text(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed text with the sentence embedding model used for agent matching.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Unit-length float32 embedding, or None if embeddings are unavailable
+        """
+        model = self._get_model()
+        if model is None:
+            return None
+        
+        try:
+            return self._embed(model, [text])[0]
+        except Exception as e:
+            logger.warning("Embedding text failed: %s", e)
+            return None
+    
+    def _embed(self, model, texts: List[str]) -> np.ndarray:
+        """Encode texts into unit-length float32 embeddings, one row per text."""
+        return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    
+    def _score_embeddings(self, query: str, agents: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Score every agent by cosine similarity of sentence embeddings.
+        
+        Agent embeddings are computed once per agent text and stacked into a
+        matrix that is reused until the agent list changes.
+        
+        Args:
+            query: Query description
+            agents: List of available agents
+            
+        Returns:
+            Array of cosine similarities, one per agent, or None if embeddings are unavailable
+        """
+        model = self._get_model()
+        if model is None:
+            return None
+        
+        try:
+            self._build_embedding_matrix(model, agents)
+            query_embedding = self._embed(model, [query])[0]
+            if self._projected_matrix is not None:
+                query_embedding = self._pca[0] @ query_embedding
+            
+            if self._quantized_matrix is not None:
+                values, scales = self._quantized_matrix
+                query_values, query_scale = _quantize_rows(query_embedding)
+                # Integer dot products accumulate in int32, then get rescaled per row
+                raw = np.einsum('ij,j->i', values, query_values.astype(np.int32))
+                return raw * (scales * query_scale)
+            
+            if self._projected_matrix is not None:
+                return self._projected_matrix @ query_embedding
+            return self._embedding_matrix[1] @ query_embedding
+        except Exception as e:
+            logger.warning("Embedding similarity failed, using text-based similarity: %s", e)
             return None
     
-    def _calculate_similarity(self, query: str, agent: Dict[str, Any]) -> float:
+    def _text_features(self, text: str) -> TextFeatures:
+        """
+        Tokenize text into the features used by the similarity metrics.
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Token set, keyword set (words longer than 3 characters) and word counts
+        """
+        words = _words(text)
+        tokens = frozenset(words)
+        return TextFeatures(
+            tokens=tokens,
+            keywords=frozenset(word for word in tokens if len(word) > 3),
+            counts=Counter(words)
+        )
+    
+    def _agent_keys(self, agents: List[Dict[str, Any]]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """
+        Get the comparison text and the description of every agent.
+        
+        Recomputed only when given a different list than last time, so passing
+        the same (unmodified) list, e.g. from AgentStorage.list_agents(),
+        skips the per-agent work entirely.
+        
+        Args:
+            agents: List of available agents
+            
+        Returns:
+            Texts and descriptions, in agent order
+        """
+        cached = self._agent_keys_cache
+        if cached is not None and cached[0] is agents and cached[1] == len(agents):
+            return cached[2], cached[3]
+        
+        texts = tuple(self._agent_text(agent) for agent in agents)
+        descriptions = tuple(agent.get('description', '') for agent in agents)
+        self._agent_keys_cache = (agents, len(agents), texts, descriptions)
+        return texts, descriptions
+    
+    def _agent_text(self, agent: Dict[str, Any]) -> str:
+        """Combine agent description, task type and name for comparison."""
+        return f"{agent.get('description', '')} {agent.get('task_type', '')} {agent.get('name', '')}"
+    
+    def _prepare_agent(self, agent: Dict[str, Any]) -> TextFeatures:
+        """
+        Get the precomputed features for an agent, tokenizing it on first use.
+        
+        Args:
+            agent: Agent dictionary
+            
+        Returns:
+            Features of the agent's description, task type and name
+        """
+        agent_text = self._agent_text(agent)
+        features = self._agent_features.get(agent_text)
+        if features is None:
+            features = self._agent_features[agent_text] = self._text_features(agent_text)
+        return features
+    
+    def _build_index(self, agents: List[Dict[str, Any]]) -> AgentIndex:
+        """
+        Get the term-count index for agents, rebuilding it only when they change.
+        
+        Args:
+            agents: List of available agents
+            
+        Returns:
+            Index whose rows follow the order of agents
+        """
+        texts = self._agent_keys(agents)[0]
+        if self._index is not None and self._index.texts == texts:
+            return self._index
+        
+        features = [self._prepare_agent(agent) for agent in agents]
+        # Drop features of agents that are gone or whose text changed
+        self._agent_features = dict(zip(texts, features))
+        
+        vocab: Dict[str, int] = {}
+        for feature in features:
+            for word in feature.counts:
+                vocab.setdefault(word, len(vocab))
+        
+        # Sparse rows: each agent's distinct words and their counts, back to back.
+        # No dense (agents, vocab) matrix is built, so memory grows with the text, not N * V
+        lengths = np.array([len(feature.counts) for feature in features], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        word_ids = np.fromiter(
+            (vocab[word] for feature in features for word in feature.counts),
+            dtype=np.intp, count=int(offsets[-1])
+        )
+        word_counts = np.fromiter(
+            (count for feature in features for count in feature.counts.values()),
+            dtype=float, count=int(offsets[-1])
+        )
+        rows = np.repeat(np.arange(len(agents)), lengths)
+        
+        self._index = AgentIndex(
+            texts=texts,
+            vocab=vocab,
+            token_counts=np.array([len(feature.tokens) for feature in features], dtype=float),
+            keyword_counts=np.array([len(feature.keywords) for feature in features], dtype=float),
+            norms=np.sqrt(np.bincount(rows, weights=word_counts * word_counts, minlength=len(agents))),
+            offsets=offsets,
+            rows=rows,
+            word_ids=word_ids,
+            word_counts=word_counts,
+            is_keyword=np.array([len(word) > 3 for word in vocab], dtype=np.bool_)
+        )
+        return self._index
+    
+    def _score_agents(self, query_features: TextFeatures, agents: List[Dict[str, Any]]) -> Sequence[float]:
+        """
+        Score every agent against the query in one vectorized pass.
+        
+        Produces the same weighted Jaccard / keyword overlap / cosine score as
+        _calculate_similarity, for all agents at once. Uses the compiled scan
+        when numba is installed, and scores agents one by one without NumPy.
+        
+        Args:
+            query_features: Precomputed features of the query
+            agents: List of available agents
+            
+        Returns:
+            Similarity scores between 0 and 1, one per agent
+        """
+        if np is None:
+            return [self._calculate_similarity("", agent, query_features) for agent in agents]
+        
+        index = self._build_index(agents)
+        vocab = index.vocab
+        
+        # Only query words known to some agent can overlap with an agent
+        query_words = [word for word in query_features.counts if word in vocab]
+        columns = [vocab[word] for word in query_words]
+        
+        query_counts = np.zeros(len(vocab))
+        query_counts[columns] = [query_features.counts[word] for word in query_words]
+        query_norm = math.sqrt(sum(count * count for count in query_features.counts.values()))
+        
+        if _scan_scores is not None:
+            return _scan_scores(
+                index.offsets, index.word_ids, index.word_counts, index.token_counts,
+                index.keyword_counts, index.norms, index.is_keyword, query_counts,
+                len(query_features.tokens), len(query_features.keywords), query_norm,
+                np.array(METRIC_WEIGHTS)
+            )
+        
+        # Sum per-entry quantities into per-agent totals over the sparse rows
+        n_agents = len(agents)
+        entry_query_counts = query_counts[index.word_ids]
+        shared = entry_query_counts > 0
+        
+        n_tokens = len(query_features.tokens)
+        shared_tokens = np.bincount(index.rows, weights=shared, minlength=n_agents)
+        union = index.token_counts + n_tokens - shared_tokens
+        jaccard = np.divide(shared_tokens, union, out=np.zeros(n_agents), where=union > 0)
+        if n_tokens == 0:
+            jaccard[index.token_counts == 0] = 1.0
+        
+        n_keywords = len(query_features.keywords)
+        # A shared word is a keyword for the query and the agent alike
+        shared_keywords = np.bincount(index.rows, weights=shared & index.is_keyword[index.word_ids], minlength=n_agents)
+        max_keywords = np.maximum(index.keyword_counts, n_keywords)
+        keyword_overlap = np.divide(shared_keywords, max_keywords, out=np.zeros(n_agents), where=max_keywords > 0)
+        if n_keywords == 0:
+            keyword_overlap[index.keyword_counts == 0] = 1.0
+        else:
+            keyword_overlap[index.keyword_counts == 0] = 0.0
+        
+        dot_products = np.bincount(index.rows, weights=index.word_counts * entry_query_counts, minlength=n_agents)
+        magnitudes = index.norms * query_norm
+        cosine = np.divide(dot_products, magnitudes, out=np.zeros(n_agents), where=magnitudes > 0)
+        if query_norm == 0:
+            cosine[index.norms == 0] = 1.0
+        
+        jaccard_weight, keyword_weight, cosine_weight = METRIC_WEIGHTS
+        scores = jaccard_weight * jaccard + keyword_weight * keyword_overlap + cosine_weight * cosine
+        return np.minimum(scores, 1.0)
+    
+    def _calculate_similarity(self, query: str, agent: Dict[str, Any],
+                              query_features: Optional[TextFeatures] = None) -> float:
         """
         Calculate similarity between query and agent.
         
         Args:
             query: Query description
             agent: Agent dictionary
+            query_features: Precomputed features of the query, if available
             
         Returns:
             Similarity score between 0 and 1
         """
-        # Combine agent description and task type for comparison
-        agent_text = f"{agent.get('description', '')} {agent.get('task_type', '')} {agent.get('name', '')}"
-        print(agent_text, ' ::::::agent_text')
+        if query_features is None:
+            query_features = self._text_features(query)
+        agent_features = self._prepare_agent(agent)
         # Use multiple similarity metrics and average them
         scores = [
-            self._jaccard_similarity(query, agent_text),
-            self._keyword_overlap_similarity(query, agent_text),
-            self._cosine_similarity_simple(query, agent_text)
+            self._jaccard_similarity(query_features.tokens, agent_features.tokens),
+            self._keyword_overlap_similarity(query_features.keywords, agent_features.keywords),
+            self._cosine_similarity_simple(query_features.counts, agent_features.counts)
         ]
         
         # Return weighted average
-        weights = [0.4, 0.3, 0.3]
-        weighted_score = sum(score * weight for score, weight in zip(scores, weights))
-        print(weighted_score, ' ::::::weighted_score')
+        weighted_score = sum(score * weight for score, weight in zip(scores, METRIC_WEIGHTS))
         return min(weighted_score, 1.0)  # Ensure score doesn't exceed 1.0
     
-    def _jaccard_similarity(self, text1: str, text2: str) -> float:
+    def _jaccard_similarity(self, tokens1: FrozenSet[str], tokens2: FrozenSet[str]) -> float:
         """
-        Calculate Jaccard similarity between two texts.
+        Calculate Jaccard similarity between two token sets.
         
         Args:
-            text1: First text
-            text2: Second text
+            tokens1: Tokens of the first text
+            tokens2: Tokens of the second text
             
         Returns:
             Jaccard similarity score
         """
-        # Normalize and tokenize
-        tokens1 = set(self._normalize_text(text1).split())
-        tokens2 = set(self._normalize_text(text2).split())
-        
         if not tokens1 and not tokens2:
             return 1.0
         if not tokens1 or not tokens2:
             return 0.0
         
-        # Calculate Jaccard similarity
-        intersection = len(tokens1.intersection(tokens2))
-        union = len(tokens1.union(tokens2))
+        # Calculate Jaccard similarity; the union size follows from the intersection
+        intersection = len(tokens1 & tokens2)
+        union = len(tokens1) + len(tokens2) - intersection
         
         return intersection / union if union > 0 else 0.0
     
-    def _keyword_overlap_similarity(self, text1: str, text2: str) -> float:
+    def _keyword_overlap_similarity(self, keywords1: FrozenSet[str], keywords2: FrozenSet[str]) -> float:
         """
         Calculate keyword overlap similarity.
         
         Args:
-            text1: First text
-            text2: Second text
+            keywords1: Keywords (words longer than 3 characters) of the first text
+            keywords2: Keywords of the second text
             
         Returns:
             Keyword overlap score
         """
-        # Extract keywords (words longer than 3 characters)
-        keywords1 = set(word for word in self._normalize_text(text1).split() if len(word) > 3)
-        keywords2 = set(word for word in self._normalize_text(text2).split() if len(word) > 3)
-        
         if not keywords1 and not keywords2:
             return 1.0
         if not keywords1 or not keywords2:
             return 0.0
         
         # Calculate overlap
-        overlap = len(keywords1.intersection(keywords2))
+        overlap = len(keywords1 & keywords2)
         max_possible = max(len(keywords1), len(keywords2))
         
         return overlap / max_possible if max_possible > 0 else 0.0
     
-    def _cosine_similarity_simple(self, text1: str, text2: str) -> float:
+    def _cosine_similarity_simple(self, counts1: Counter, counts2: Counter) -> float:
         """
         Calculate simple cosine similarity based on word frequencies.
         
         Args:
-            text1: First text
-            text2: Second text
+            counts1: Word counts of the first text
+            counts2: Word counts of the second text
             
         Returns:
             Cosine similarity score
         """
-        # Get word frequency vectors
-        words1 = self._normalize_text(text1).split()
-        words2 = self._normalize_text(text2).split()
-        
-        # Create vocabulary
-        vocab = list(set(words1 + words2))
-        
-        if not vocab:
+        if not counts1 and not counts2:
             return 1.0
         
-        # Create frequency vectors
-        vec1 = np.array([words1.count(word) for word in vocab])
-        vec2 = np.array([words2.count(word) for word in vocab])
-        
-        # Calculate cosine similarity
-        dot_product = np.dot(vec1, vec2)
-        magnitude1 = np.linalg.norm(vec1)
-        magnitude2 = np.linalg.norm(vec2)
+        # Only words present in both texts contribute to the dot product
+        if len(counts1) > len(counts2):
+            counts1, counts2 = counts2, counts1
+        dot_product = sum(count * counts2[word] for word, count in counts1.items() if word in counts2)
+        magnitude1 = math.sqrt(sum(count * count for count in counts1.values()))
+        magnitude2 = math.sqrt(sum(count * count for count in counts2.values()))
         
         if magnitude1 == 0 or magnitude2 == 0:
             return 0.0
@@ -190,14 +730,161 @@ class SimilaritySearch:
         Returns:
             Normalized text
         """
-        # Convert to lowercase
-        text = text.lower()
+        return _normalize(text)
+    
+    def _build_embedding_matrix(self, model, agents: List[Dict[str, Any]]):
+        """
+        Stack agent embeddings into a matrix, rebuilding it only when the agents change.
+        
+        Args:
+            model: Loaded embedding model
+            agents: List of available agents
+        """
+        texts = self._agent_keys(agents)[0]
+        if self._embedding_matrix is not None and self._embedding_matrix[0] == texts:
+            return
         
-        # Remove special characters and extra whitespace
-        text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
+        if not self._persisted_loaded:
+            self._load_embeddings()
         
-        return text.strip()
+        missing = [text for text in dict.fromkeys(texts) if text not in self._embeddings]
+        if missing:
+            self._embeddings.update(zip(missing, self._embed(model, missing)))
+        # Drop embeddings of agents that are gone or whose text changed
+        self._embeddings = {text: self._embeddings[text] for text in texts}
+        
+        if self._persisted is not None and self._persisted[0] == texts:
+            self._embedding_matrix = (texts, self._persisted[1])
+        else:
+            matrix = np.stack([self._embeddings[text] for text in texts])
+            # Drop every view of the memory-mapped file before it gets replaced
+            # (Windows cannot replace a file that is still mapped)
+            self._embeddings = dict(zip(texts, matrix))
+            self._embedding_matrix = (texts, matrix)
+            self._persisted = None
+            self._save_embeddings(texts, matrix)
+        self._update_pca()
+    
+    def _embeddings_keys_file(self) -> str:
+        """Sidecar file listing the agent text of each row of embeddings_file."""
+        return os.path.splitext(self.embeddings_file)[0] + ".keys.json"
+    
+    def _load_embeddings(self):
+        """
+        Load agent embeddings saved by a previous run.
+        
+        The matrix is memory-mapped, so only the rows that are used get read.
+        It is ignored if it was written for another model or does not match
+        its keys file (e.g. after an interrupted save).
+        """
+        self._persisted_loaded = True
+        if not self.embeddings_file or not os.path.exists(self.embeddings_file):
+            return
+        
+        try:
+            with open(self._embeddings_keys_file(), 'r', encoding='utf-8') as f:
+                keys = json.load(f)
+            
+            stat = os.stat(self.embeddings_file)
+            if keys.get("model") != EMBEDDING_MODEL or keys.get("file") != [stat.st_size, stat.st_mtime_ns]:
+                logger.info("Ignoring stale agent embeddings in %s", self.embeddings_file)
+                return
+            
+            texts = tuple(keys["texts"])
+            matrix = np.load(self.embeddings_file, mmap_mode='r')
+            if matrix.ndim != 2 or len(matrix) != len(texts) or matrix.dtype != np.float32:
+                raise ValueError(f"unexpected matrix shape {matrix.shape}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Could not load agent embeddings from %s: %s", self.embeddings_file, e)
+            return
+        
+        self._embeddings.update(zip(texts, matrix))
+        self._persisted = (texts, matrix)
+        logger.info("Loaded %s agent embeddings from %s", len(texts), self.embeddings_file)
+    
+    def _save_embeddings(self, texts: Tuple[str, ...], matrix: np.ndarray):
+        """
+        Write the agent embedding matrix and its keys file.
+        
+        Args:
+            texts: Agent text of each row
+            matrix: (agents, dimensions) float32 embedding matrix
+        """
+        if not self.embeddings_file:
+            return
+        
+        keys_file = self._embeddings_keys_file()
+        try:
+            temp_file = self.embeddings_file + ".tmp"
+            with open(temp_file, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(temp_file, self.embeddings_file)
+            
+            # Record which matrix file the keys belong to, to detect a crash between the two writes
+            stat = os.stat(self.embeddings_file)
+            keys = {"model": EMBEDDING_MODEL, "file": [stat.st_size, stat.st_mtime_ns], "texts": list(texts)}
+            with open(keys_file + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(keys, f)
+            os.replace(keys_file + ".tmp", keys_file)
+        except OSError as e:
+            logger.warning("Could not save agent embeddings to %s: %s", self.embeddings_file, e)
+            return
+        
+        self._persisted = (texts, matrix)
+    
+    def prepare(self, agents: List[Dict[str, Any]]):
+        """
+        Build the agent-side search structures ahead of a search.
+        
+        Loads the embedding model and embeds the agents, or builds the
+        term-count index when embeddings are unavailable, so that a following
+        find_similar_agent call over the same agents only has to score the query.
+        
+        Args:
+            agents: List of available agents
+        """
+        if not agents:
+            return
+        
+        model = self._get_model()
+        if model is not None:
+            try:
+                self._build_embedding_matrix(model, agents)
+                return
+            except Exception as e:
+                logger.warning("Embedding agents failed: %s", e)
+        
+        if np is None:
+            for agent in agents:
+                self._prepare_agent(agent)
+        else:
+            self._build_index(agents)
+    
+    def _update_pca(self):
+        """
+        Project the agent embedding matrix onto its principal components.
+        
+        Components are fitted once enough agents exist and refitted when the
+        agent count has more than doubled since the last fit. Components are
+        fitted on the uncentered embeddings, so they span the agent vectors
+        themselves: reduced dot products equal the full cosine similarities
+        up to PCA_COMPONENTS agents and are their best rank-PCA_COMPONENTS
+        approximation beyond that, so embedding_threshold still applies.
+        """
+        matrix = self._embedding_matrix[1]
+        n_agents, dimensions = matrix.shape
+        if n_agents < PCA_MIN_AGENTS or dimensions <= PCA_COMPONENTS:
+            self._projected_matrix = None
+        else:
+            if self._pca is None or n_agents > 2 * self._pca[1]:
+                _, _, vt = np.linalg.svd(matrix, full_matrices=False)
+                self._pca = (np.ascontiguousarray(vt[:PCA_COMPONENTS], dtype=np.float32), n_agents)
+                logger.info("Fitted PCA on %s agent embeddings (%s -> %s dimensions)", n_agents, dimensions, len(self._pca[0]))
+            self._projected_matrix = np.ascontiguousarray(matrix @ self._pca[0].T)
+        
+        if self.quantize_embeddings:
+            searched = self._projected_matrix if self._projected_matrix is not None else matrix
+            self._quantized_matrix = _quantize_rows(searched)
     
     def get_similarity_scores(self, query_description: str, agents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -211,13 +898,20 @@ class SimilaritySearch:
             List of agents with their similarity scores
         """
         results = []
+        if not agents:
+            return results
+        
+        scores = self._score_embeddings(query_description, agents)
+        threshold = self.embedding_threshold
+        if scores is None:
+            scores = self._score_agents(self._text_features(query_description), agents)
+            threshold = self.similarity_threshold
         
-        for agent in agents:
-            score = self._calculate_similarity(query_description, agent)
+        for agent, score in zip(agents, map(float, scores)):
             results.append({
                 "agent": agent,
                 "similarity_score": score,
-                "meets_threshold": score >= self.similarity_threshold
+                "meets_threshold": score >= threshold
             })
         
         # Sort by similarity score (descending)
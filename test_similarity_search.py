@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for agent matching in SimilaritySearch.
+"""
+
+import math
+import random
+import re
+import zlib
+
+import numpy as np
+import pytest
+
+import similarity_search
+from similarity_search import PCA_MIN_AGENTS, SIMHASH_MAX_DISTANCE, SimilaritySearch, _simhash
+
+
+class FakeEmbeddingModel:
+    """Deterministic stand-in for SentenceTransformer with anisotropic embeddings."""
+
+    def __init__(self, dimensions: int = 384):
+        # Sentence embeddings share a large common direction
+        self.mean = np.random.default_rng(0).standard_normal(dimensions)
+        self.mean /= np.linalg.norm(self.mean)
+
+    def encode(self, texts, normalize_embeddings=True):
+        rows = []
+        for text in texts:
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            vector = 3 * self.mean + rng.standard_normal(len(self.mean)) / np.sqrt(len(self.mean))
+            rows.append(vector / np.linalg.norm(vector))
+        return np.array(rows, dtype=np.float32)
+
+
+def make_agents(count: int):
+    """Build distinct agent dictionaries."""
+    return [
+        {"name": f"Agent{i}", "description": f"Handles task family {i}", "task_type": "general"}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("count", [PCA_MIN_AGENTS, 60])
+def test_projected_scores_match_full_scores(count):
+    """PCA-projected scores equal the full-dimension cosine similarities."""
+    model = FakeEmbeddingModel()
+    search = SimilaritySearch()
+    search._model = model
+    agents = make_agents(count)
+    query = agents[7]["description"] + " general Agent7"
+
+    scores = search._score_embeddings(query, agents)
+    assert search._projected_matrix is not None
+
+    agent_vectors = model.encode([search._agent_text(agent) for agent in agents])
+    full_scores = agent_vectors @ model.encode([query])[0]
+    np.testing.assert_allclose(scores, full_scores, atol=1e-4)
+    assert int(np.argmax(scores)) == 7
+    assert scores[7] >= search.embedding_threshold
+
+
+def simhash_distance(text1: str, text2: str) -> int:
+    """Number of differing bits between two texts' SimHashes."""
+    return bin(_simhash(text1) ^ _simhash(text2)).count("1")
+
+
+@pytest.mark.parametrize("existing, query", [
+    ("Creative writing helper for horror stories", "Creative writing helper for romance stories"),
+    ("Python coding expert for writing and debugging code", "Perl coding expert for writing and debugging code"),
+    ("Java coding expert for writing and debugging code", "Rust coding expert for writing and debugging code"),
+])
+def test_simhash_neighbours_with_different_words_are_not_duplicates(existing, query):
+    """Descriptions differing in a meaningful word are not merged, even with close SimHashes."""
+    assert simhash_distance(existing, query) <= SIMHASH_MAX_DISTANCE
+    agents = [{"name": "Existing", "description": existing, "task_type": "general"}]
+
+    assert SimilaritySearch()._find_duplicate(query, agents) is None
+
+
+@pytest.mark.parametrize("existing, query", [
+    ("Creative writing helper for horror stories", "creative writing helper, for HORROR stories!"),
+    ("Python coding expert for writing and debugging code", "Coding expert for writing and debugging Python code"),
+])
+def test_cosmetic_variants_are_duplicates(existing, query):
+    """Descriptions with the same words, up to case, punctuation and order, are duplicates."""
+    agents = [
+        {"name": "Other", "description": "Math tutor for algebra homework", "task_type": "math"},
+        {"name": "Existing", "description": existing, "task_type": "general"},
+    ]
+
+    assert SimilaritySearch()._find_duplicate(query, agents) is agents[1]
+
+
+def baseline_similarity(query: str, agent: dict) -> float:
+    """The original weighted Jaccard / keyword overlap / cosine score, kept as a reference."""
+    def words(text):
+        text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text.lower())
+        return re.sub(r'\s+', ' ', text).strip().split()
+
+    words1 = words(query)
+    words2 = words(f"{agent.get('description', '')} {agent.get('task_type', '')} {agent.get('name', '')}")
+    tokens1, tokens2 = set(words1), set(words2)
+    keywords1 = {word for word in tokens1 if len(word) > 3}
+    keywords2 = {word for word in tokens2 if len(word) > 3}
+
+    if not tokens1 and not tokens2:
+        jaccard = 1.0
+    elif not tokens1 or not tokens2:
+        jaccard = 0.0
+    else:
+        jaccard = len(tokens1 & tokens2) / len(tokens1 | tokens2)
+
+    if not keywords1 and not keywords2:
+        keyword_overlap = 1.0
+    elif not keywords1 or not keywords2:
+        keyword_overlap = 0.0
+    else:
+        keyword_overlap = len(keywords1 & keywords2) / max(len(keywords1), len(keywords2))
+
+    vocab = tokens1 | tokens2
+    if not vocab:
+        cosine = 1.0
+    else:
+        vec1 = [words1.count(word) for word in vocab]
+        vec2 = [words2.count(word) for word in vocab]
+        magnitude1 = math.sqrt(sum(count * count for count in vec1))
+        magnitude2 = math.sqrt(sum(count * count for count in vec2))
+        if magnitude1 == 0 or magnitude2 == 0:
+            cosine = 0.0
+        else:
+            cosine = sum(a * b for a, b in zip(vec1, vec2)) / (magnitude1 * magnitude2)
+
+    return min(0.4 * jaccard + 0.3 * keyword_overlap + 0.3 * cosine, 1.0)
+
+
+def random_agents(seed: int):
+    """Agents with random descriptions drawn from a small vocabulary, plus edge cases."""
+    rng = random.Random(seed)
+    vocab = "python coding assistant creative writing helper math research data the of for a".split()
+
+    def text(max_words):
+        return " ".join(rng.choice(vocab) for _ in range(rng.randint(0, max_words))) + rng.choice(["", "!", " C++", " résumé"])
+
+    agents = [
+        {"name": f"Agent{i}", "description": text(12), "task_type": rng.choice(["coding", "math", "", "Writing"])}
+        for i in range(30)
+    ]
+    queries = [text(8) for _ in range(10)]
+    return agents, queries
+
+
+EDGE_AGENTS = [
+    {"name": "Coder", "description": "Python coding assistant", "task_type": "coding"},
+    {"name": "", "description": "", "task_type": ""},
+    {"name": "X"},
+    {"name": "", "description": "!!! ... ???", "task_type": "--"},
+    {"name": "Résumé", "description": "Naïve café writer für Übersetzung 数据", "task_type": "writing"},
+    {"name": "Repeat", "description": "math math math data data", "task_type": "math"},
+]
+
+EDGE_QUERIES = [
+    "",
+    "   ",
+    "!!!",
+    "python coding",
+    "résumé café naïve",
+    "数据 分析",
+    "math math",
+    "Python, coding; assistant!",
+]
+
+
+def score_paths(search: SimilaritySearch, query: str, agents: list, monkeypatch) -> dict:
+    """Score agents with every available implementation of the lexical metric."""
+    features = search._text_features(query)
+    scores = {"scalar": [search._calculate_similarity(query, agent) for agent in agents]}
+    if similarity_search._scan_scores is not None:
+        scores["numba"] = [float(score) for score in search._score_agents(features, agents)]
+    with monkeypatch.context() as patch:
+        patch.setattr(similarity_search, "_scan_scores", None)
+        scores["numpy"] = [float(score) for score in search._score_agents(features, agents)]
+    return scores
+
+
+@pytest.mark.parametrize("seed", [None, 1, 2, 3])
+def test_lexical_score_paths_match_baseline(seed, monkeypatch):
+    """The scalar, NumPy and numba scorers agree with each other and with the original metric."""
+    if seed is None:
+        agents, queries = EDGE_AGENTS, EDGE_QUERIES
+    else:
+        agents, queries = random_agents(seed)
+    search = SimilaritySearch(use_embeddings=False)
+
+    for query in queries:
+        expected = [baseline_similarity(query, agent) for agent in agents]
+        for path, scores in score_paths(search, query, agents, monkeypatch).items():
+            assert scores == pytest.approx(expected, abs=1e-12), (path, query)
@@ -5,7 +5,6 @@ Test script to demonstrate the AI Agents System functionality.
 
 import os
 import sys
-from master_agent import MasterAgent
 from utils import setup_logging
 
 def test_ai_agents_system():
@@ -23,7 +22,8 @@ def test_ai_agents_system():
     print("=" * 50)
     
     try:
-        # Initialize master agent
+        # Initialize master agent (imported late so the API key check needs no heavy imports)
+        from master_agent import MasterAgent
         master_agent = MasterAgent()
         print("✅ Master agent initialized")
         
@@ -1,22 +1,103 @@
 """
 Utility functions for the AI Agents System.
+
+Log calls pass %-style arguments instead of f-strings, so messages are only
+formatted when a record is actually emitted.
 """
 
+import atexit
+import functools
 import logging
 import os
+import queue
+import re
+import string
 import sys
+import time
 from datetime import datetime
-from typing import Dict, Any
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+from typing import Dict, Any, Iterable, List, Optional
+
+try:
+    # google-re2 matches without backtracking; same API for these patterns
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
+logger = logging.getLogger(__name__)
+
+# Environment variables validate_environment requires
+_REQUIRED_VARS = ("GEMINI_API_KEY",)
+
+# Characters not allowed in agent names
+_SANITIZE_RE = _re_engine.compile(r'[^a-zA-Z0-9_]')
+_KEEP = frozenset(string.ascii_letters + string.digits + '_')
+_ASCII_LETTERS = frozenset(string.ascii_letters)
+# The same characters as ASCII bytes, deleted from ASCII names with bytes.translate
+_SANITIZE_DELETE = bytes(c for c in range(128) if chr(c) not in _KEEP)
+
+# Error keywords ("API" is matched case-sensitively) and their user-facing
+# messages, in priority order
+_ERR_RE = _re_engine.compile(r'API|(?i:key|timeout|json)')
+_ERR_MAP = {
+    "api": "❌ API connection issue. Please check your GEMINI_API_KEY.",
+    "key": "❌ API connection issue. Please check your GEMINI_API_KEY.",
+    "timeout": "⏰ Request timed out. Please try again.",
+    "json": "🔧 Data parsing error. The system will retry automatically.",
+}
+
+# Shown by print_welcome_banner
+_WELCOME_BANNER = """
+╔══════════════════════════════════════════════════════════════╗
+║                    🤖 AI Agents System                      ║
+║              Dynamic Agent Creation & Delegation             ║
+╚══════════════════════════════════════════════════════════════╝
+
+Features:
+  🎯 Master agent with intelligent task delegation
+  🔍 Similarity search for existing agents
+  ⚡ Dynamic agent creation when needed
+  💾 Persistent agent storage
+  📊 Hierarchical task management
+
+Commands:
+  • Enter any request to start delegation
+  • Type 'quit', 'exit', or 'q' to exit
+  • Use Ctrl+C for emergency exit
+
+
+"""
+_WELCOME_BANNER_BYTES = _WELCOME_BANNER.encode('utf-8')
+
+# Last whole second formatted by get_timestamp and its ISO string
+_last_timestamp = (None, "")
+
+# Writes queued log records to the file and console on a background thread
+_log_listener: Optional[QueueListener] = None
+
+# Set once setup_logging has run; later calls are no-ops
+_logging_configured = False
 
 
 def setup_logging(log_level: str = "INFO", log_file: str = "agents_system.log"):
     """
     Setup logging configuration for the system.
     
+    Loggers only enqueue records; a background listener thread does the
+    file and console writes, so logging never blocks the caller on I/O.
+    File writes are batched and flushed every 1024 records, on errors and
+    at exit. Only the first call configures logging; later calls return
+    immediately.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR)
         log_file: Log file path
     """
+    global _log_listener, _logging_configured
+    
+    if _logging_configured:
+        return
+    
     # Convert string log level to logging constant
     numeric_level = getattr(logging, log_level.upper(), logging.INFO)
     
@@ -30,37 +111,70 @@ def setup_logging(log_level: str = "INFO", log_file: str = "agents_system.log"):
     file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(numeric_level)
     file_handler.setFormatter(formatter)
+    buffered_file_handler = MemoryHandler(
+        capacity=1024,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+        flushOnClose=True
+    )
+    # MemoryHandler hands records straight to its target, skipping the target's level check
+    buffered_file_handler.setLevel(numeric_level)
     
     # Setup console handler (only for WARNING and above to keep terminal clean)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.WARNING)
     console_handler.setFormatter(formatter)
     
-    # Configure root logger
+    # Configure root logger to hand records to the listener through a queue
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    # Records are formatted by the listener's handlers, not on the way into the queue
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
     logging.basicConfig(
         level=numeric_level,
-        handlers=[file_handler, console_handler]
+        handlers=[queue_handler]
     )
     
+    if queue_handler in logging.getLogger().handlers:
+        _log_listener = QueueListener(log_queue, buffered_file_handler, console_handler, respect_handler_level=True)
+        _log_listener.start()
+        # On shutdown (in reverse order): drain the queue, flush the buffer, close the file
+        atexit.register(file_handler.close)
+        atexit.register(buffered_file_handler.flush)
+        atexit.register(_log_listener.stop)
+    else:
+        # Logging was already configured; keep that configuration
+        file_handler.close()
+    
     # Reduce noise from external libraries
-    logging.getLogger('google').setLevel(logging.WARNING)
-    logging.getLogger('urllib3').setLevel(logging.WARNING)
-    logging.getLogger('requests').setLevel(logging.WARNING)
+    for name in ('google', 'urllib3', 'requests'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    
+    _logging_configured = True
+
+
+def get_api_key() -> Optional[str]:
+    """
+    Get the Gemini API key from the environment.
+    
+    Returns:
+        The GEMINI_API_KEY value, or None if it is unset or empty
+    """
+    return os.environ.get("GEMINI_API_KEY") or None
 
 
+@functools.lru_cache(maxsize=1)
 def validate_environment():
     """
     Validate that required environment variables are set.
     
+    The result is cached for the life of the process, since the environment
+    does not change; call validate_environment.cache_clear() after changing it.
+    
     Returns:
         True if environment is valid, False otherwise
     """
-    required_vars = ["GEMINI_API_KEY"]
-    
-    missing_vars = []
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_vars.append(var)
+    missing_vars = [var for var in _REQUIRED_VARS if not os.environ.get(var)]
     
     if missing_vars:
         print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
@@ -84,6 +198,7 @@ def format_agent_info(agent: Dict[str, Any]) -> str:
     task_type = agent.get("task_type", "general")
     created_by = agent.get("created_by", "Unknown")
     
+    # A single f-string is built in one step, without a template parse or join
     return f"""
 🤖 Agent: {name}
 📋 Type: {task_type}
@@ -92,6 +207,29 @@ def format_agent_info(agent: Dict[str, Any]) -> str:
 """
 
 
+def format_agents_info(agents: Iterable[Dict[str, Any]]) -> str:
+    """
+    Format information for several agents for display.
+    
+    Args:
+        agents: Agent dictionaries
+        
+    Returns:
+        The format_agent_info text of each agent, joined by newlines
+    """
+    return "\n".join([format_agent_info(agent) for agent in agents])
+
+
+def _emit(text: str):
+    """
+    Write text to stdout in a single call.
+    
+    Args:
+        text: Text to write, including any trailing newline
+    """
+    sys.stdout.write(text)
+
+
 def print_system_stats(agent_storage):
     """
     Print system statistics.
@@ -101,26 +239,44 @@ def print_system_stats(agent_storage):
     """
     stats = agent_storage.get_storage_stats()
     
-    print("\n📊 System Statistics:")
-    print(f"   Total Agents: {stats['total_agents']}")
+    # Build the whole report so it is written out at once
+    parts = ["", "📊 System Statistics:", f"   Total Agents: {stats['total_agents']}"]
     
     if stats['agents_by_type']:
-        print("   Agents by Type:")
+        parts.append("   Agents by Type:")
         for agent_type, count in stats['agents_by_type'].items():
-            print(f"     - {agent_type}: {count}")
+            parts.append(f"     - {agent_type}: {count}")
     
-    print(f"   Storage File: {stats['storage_file']}")
-    print(f"   File Exists: {stats['file_exists']}")
+    parts.append(f"   Storage File: {stats['storage_file']}")
+    parts.append(f"   File Exists: {stats['file_exists']}")
+    _emit("\n".join(parts) + "\n")
 
 
-def get_timestamp() -> str:
+def get_timestamp(precise: bool = False) -> str:
     """
     Get current timestamp as string.
     
+    The formatted string is reused until the second changes, so bursts of
+    calls only format the timestamp once.
+    
+    Args:
+        precise: Include microseconds (formatted on every call)
+        
     Returns:
         Current timestamp in ISO format
     """
-    return datetime.now().isoformat()
+    global _last_timestamp
+    
+    if precise:
+        return datetime.now().isoformat()
+    
+    second = int(time.time())
+    last_second, timestamp = _last_timestamp
+    if second != last_second:
+        timestamp = datetime.fromtimestamp(second).isoformat()
+        # Swapped as one tuple so concurrent callers never see a mismatched pair
+        _last_timestamp = (second, timestamp)
+    return timestamp
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
@@ -134,10 +290,22 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     Returns:
         Truncated text with ellipsis if needed
     """
-    if len(text) <= max_length:
-        return text
+    return text if len(text) <= max_length else f"{text[:max_length - 3]}..."
+
+
+def truncate_texts(texts: Iterable[str], max_length: int = 100) -> List[str]:
+    """
+    Truncate several texts to the same length.
     
-    return text[:max_length - 3] + "..."
+    Args:
+        texts: Texts to truncate
+        max_length: Maximum length
+        
+    Returns:
+        Truncated texts, in order, with ellipsis where needed
+    """
+    cut = max_length - 3
+    return [text if len(text) <= max_length else f"{text[:cut]}..." for text in texts]
 
 
 def sanitize_agent_name(name: str) -> str:
@@ -151,11 +319,13 @@ def sanitize_agent_name(name: str) -> str:
         Sanitized agent name
     """
     # Remove special characters and spaces
-    import re
-    sanitized = re.sub(r'[^a-zA-Z0-9_]', '', name)
+    if name.isascii():
+        sanitized = name.encode('ascii').translate(None, _SANITIZE_DELETE).decode('ascii')
+    else:
+        sanitized = _SANITIZE_RE.sub('', name)
     
     # Ensure it starts with a letter
-    if sanitized and not sanitized[0].isalpha():
+    if sanitized and sanitized[0] not in _ASCII_LETTERS:
         sanitized = 'Agent' + sanitized
     
     # Ensure minimum length
@@ -166,27 +336,32 @@ def sanitize_agent_name(name: str) -> str:
 
 
 def print_welcome_banner():
-    """Print welcome banner for the system."""
-    banner = """
-╔══════════════════════════════════════════════════════════════╗
-║                    🤖 AI Agents System                      ║
-║              Dynamic Agent Creation & Delegation             ║
-╚══════════════════════════════════════════════════════════════╝
-
-Features:
-  🎯 Master agent with intelligent task delegation
-  🔍 Similarity search for existing agents
-  ⚡ Dynamic agent creation when needed
-  💾 Persistent agent storage
-  📊 Hierarchical task management
-
-Commands:
-  • Enter any request to start delegation
-  • Type 'quit', 'exit', or 'q' to exit
-  • Use Ctrl+C for emergency exit
-
-"""
-    print(banner)
+    """
+    Print welcome banner for the system.
+    
+    When stdout is a real UTF-8 file descriptor, the pre-encoded banner is
+    written straight to it; otherwise it goes through sys.stdout as usual.
+    Windows always uses sys.stdout, since raw bytes written to the console
+    are decoded with its code page even when sys.stdout reports UTF-8.
+    """
+    if os.name == "nt":
+        _emit(_WELCOME_BANNER)
+        return
+    
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        fd = None
+    encoding = (getattr(sys.stdout, "encoding", None) or "").lower()
+    if fd is None or encoding not in ("utf-8", "utf8"):
+        _emit(_WELCOME_BANNER)
+        return
+    
+    # Anything already buffered in sys.stdout must come out first
+    sys.stdout.flush()
+    data = memoryview(_WELCOME_BANNER_BYTES)
+    while data:
+        data = data[os.write(fd, data):]
 
 
 def handle_error(error: Exception, context: str = "") -> str:
@@ -203,14 +378,12 @@ def handle_error(error: Exception, context: str = "") -> str:
     error_msg = str(error)
     
     # Log the full error
-    logging.error(f"Error in {context}: {error_msg}")
-    
-    # Return user-friendly message
-    if "API" in error_msg or "key" in error_msg.lower():
-        return "❌ API connection issue. Please check your GEMINI_API_KEY."
-    elif "timeout" in error_msg.lower():
-        return "⏰ Request timed out. Please try again."
-    elif "json" in error_msg.lower():
-        return "🔧 Data parsing error. The system will retry automatically."
-    else:
-        return f"❌ An error occurred: {error_msg}"
+    logger.error("Error in %s: %s", context, error_msg)
+    
+    # Return user-friendly message, scanning the message once for all keywords
+    found = {match.lower() for match in _ERR_RE.findall(error_msg)}
+    for keyword, message in _ERR_MAP.items():
+        if keyword in found:
+            return message
+    
+    return f"❌ An error occurred: {error_msg}"